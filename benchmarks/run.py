@@ -0,0 +1,146 @@
+"""
+Time the client's hot paths against the local mock Teamwork server.
+
+    python -m benchmarks.run --projects 500 --latency 0.02 --rate-429 0.01
+
+Each scenario runs on a fresh client and reports wall time, the requests the
+server answered (and throttled with 429), the client's retries and the peak
+memory traced while it ran.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tracemalloc
+
+import requests
+
+import teamwork
+from teamwork.transport import HttpTransport
+from benchmarks.server import add_account_arguments
+
+
+class LocalTeamwork(teamwork.Teamwork):
+    """Teamwork client pointed at the mock server instead of https://domain"""
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url
+        super().__init__("localhost", "key", **kwargs)
+
+    def get_base_url(self):
+        return self.base_url
+
+
+def get_tasks(tw):
+    tw.get_tasks(include_portfolios=True)
+
+
+def csv_all_tasks(tw):
+    with open(os.devnull, "w") as saveto:
+        csv.writer(saveto).writerows(tw.iter_task_rows(include_portfolios=True))
+
+
+def summary_for_portfolios(tw):
+    tw.get_summary_for_portfolios([".*"])
+
+
+def summary_for_tags(tw):
+    tw.get_summary_for_tags([".*"])
+
+
+SCENARIOS = [
+    ("get_tasks", get_tasks),
+    ("csv --all-tasks", csv_all_tasks),
+    ("get_summary_for_portfolios", summary_for_portfolios),
+    ("get_summary_for_tags", summary_for_tags),
+]
+
+
+def start_server(args):
+    """Start the mock server in its own process, so it isn't traced"""
+    command = [sys.executable, "-m", "benchmarks.server",
+               "--projects", str(args.projects),
+               "--tasks-per-project", str(args.tasks_per_project),
+               "--boards", str(args.boards), "--tags", str(args.tags),
+               "--latency", str(args.latency), "--rate-429", str(args.rate_429)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    url = process.stdout.readline().strip()
+    return process, url
+
+
+def run_scenario(url, func, args):
+    """Run one scenario on a fresh client and return its measurements"""
+    requests.post(url + "/__reset__")
+    transport = HttpTransport("key", pool_size=args.workers, rate_limiter=teamwork.RateLimiter(
+        rate=args.rate, per=1.0, backoff=0.01, max_backoff=0.1))
+    tw = LocalTeamwork(url, transport=transport, max_workers=args.workers,
+                       pool_size=args.workers, lazy=True)
+    if args.memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    func(tw)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if args.memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    transport.close()
+
+    stats = requests.get(url + "/__stats__").json()
+    return {
+        "seconds": round(elapsed, 3),
+        "requests": stats["total"],
+        "throttled": stats["throttled"],
+        "retries": transport.retries,
+        "bytes_in": stats["bytes_out"],
+        "peak_memory": peak,
+        "by_endpoint": stats["requests"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_account_arguments(parser)
+    parser.add_argument("--workers", type=int, default=8,
+                        help="max_workers and pool_size of the client")
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="Client rate limit, requests per second")
+    parser.add_argument("--scenario", action="append",
+                        help="Only run these scenarios (repeatable)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="Don't trace memory, which slows the client down")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    process, url = start_server(args)
+    try:
+        results = {}
+        for name, func in SCENARIOS:
+            if args.scenario and name not in args.scenario:
+                continue
+            results[name] = run_scenario(url, func, args)
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return results
+
+    print("%-28s %9s %9s %9s %8s %12s" % (
+        "scenario", "seconds", "requests", "throttled", "retries", "peak memory"))
+    for name, result in results.items():
+        peak = result["peak_memory"]
+        print("%-28s %9.3f %9d %9d %8d %12s" % (
+            name, result["seconds"], result["requests"], result["throttled"],
+            result["retries"], "%.1f MB" % (peak / 1e6) if peak is not None else "-"))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Local stand-in for the Teamwork API, serving a synthetic account.
+
+Run it on its own with:
+
+    python -m benchmarks.server --projects 500 --latency 0.05 --rate-429 0.02
+
+It prints the URL it listens on. ``GET /__stats__`` returns the number of
+requests served per endpoint and ``POST /__reset__`` zeroes them.
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class Account(object):
+    """
+    A synthetic account: projects spread over the columns of some portfolio
+    boards, tasks with a mix of past and future dates, a tag per project and
+    time entries
+    """
+    def __init__(self, projects=200, tasks_per_project=50, boards=5,
+                 columns_per_board=3, tags=20, entries_per_project=10,
+                 page_size=250):
+        self.page_size = page_size
+        self.boards = [{"id": str(board), "name": "Board %s" % board}
+                       for board in range(1, boards + 1)]
+        self.tags = [{"id": str(tag), "name": "Tag %s" % tag}
+                     for tag in range(1, tags + 1)]
+        self.columns = collections.defaultdict(list)
+        self.cards = collections.defaultdict(list)
+        self.projects = []
+        self.project_tasks = {}
+        self.project_entries = {}
+
+        column_ids = []
+        for board in self.boards:
+            for number in range(columns_per_board):
+                column_id = str(int(board["id"]) * 100 + number)
+                self.columns[board["id"]].append({"id": column_id, "name": "Column"})
+                column_ids.append((board, column_id))
+
+        for number in range(projects):
+            project_id = str(1000 + number)
+            board, column_id = column_ids[number % len(column_ids)]
+            tag = self.tags[number % len(self.tags)]
+            self.cards[column_id].append({"id": project_id + "0", "projectId": project_id})
+            self.projects.append({
+                "id": project_id, "name": "Project %s" % project_id,
+                "description": "x" * 200,
+                "startDate": "20200101", "endDate": "20301231",
+                "status": "active", "subStatus": "current",
+                "last-changed-on": "2020-01-01T00:00:00Z",
+                "owner": {"id": "1", "fullName": "Owner"},
+                "tags": [tag],
+                "portfolioBoards": [{"board": {"id": board["id"], "name": board["name"]}}],
+            })
+            self.project_tasks[project_id] = [
+                self._task(project_id, task) for task in range(tasks_per_project)]
+            self.project_entries[project_id] = [
+                {"id": "%s%03d" % (project_id, entry), "project-id": project_id,
+                 "person-id": "1", "date": "2020-%02d-01T09:00:00Z" % (entry % 12 + 1),
+                 "hours": "1", "minutes": "30", "description": "Work"}
+                for entry in range(entries_per_project)]
+
+        self.tasks = [task for tasks in self.project_tasks.values() for task in tasks]
+        self.entries = [entry for entries in self.project_entries.values()
+                        for entry in entries]
+        self.projects_by_id = dict((project["id"], project) for project in self.projects)
+
+    def _task(self, project_id, number):
+        return {
+            "id": int(project_id) * 1000 + number,
+            "content": "Task %s" % number,
+            "description": "y" * 300,
+            "project-id": int(project_id),
+            "project-name": "Project %s" % project_id,
+            "status": "completed" if number % 3 == 0 else "new",
+            "completed": number % 3 == 0,
+            "start-date": "2020%02d01" % (number % 12 + 1),
+            "due-date": "20200301" if number % 5 == 0 else "2030%02d01" % (number % 12 + 1),
+            "progress": (number * 10) % 100,
+            "estimated-minutes": 30,
+            "creator-firstname": "Ann", "creator-lastname": "Smith",
+            "responsible-party-names": "Ann Smith",
+        }
+
+    def paged(self, items, key, params):
+        page = int(params.get("page", 1))
+        page_size = int(params.get("pageSize", self.page_size))
+        start = (page - 1) * page_size
+        pages = max(1, (len(items) + page_size - 1) // page_size)
+        return {key: items[start:start + page_size]}, {
+            "X-Page": str(page), "X-Pages": str(pages), "X-Records": str(len(items))}
+
+    def routes(self):
+        """(endpoint template, path regex, handler) of every endpoint"""
+        return [
+            ("authenticate.json", r"^authenticate\.json$",
+             lambda params: ({"account": {"userId": "1"}}, {})),
+            ("tasks.json", r"^tasks\.json$",
+             lambda params: self.paged(self.tasks, "todo-items", params)),
+            ("projects.json", r"^projects\.json$", self._projects),
+            ("projects/api/v3/projects.json", r"^projects/api/v3/projects\.json$",
+             self._projects_by_ids),
+            ("projects/{id}/tasks.json", r"^projects/(?P<id>[^/]+)/tasks\.json$",
+             lambda params, id: ({"todo-items": self.project_tasks.get(id, [])}, {})),
+            ("projects/{id}/time_entries.json",
+             r"^projects/(?P<id>[^/]+)/time_entries\.json$",
+             lambda params, id: self.paged(
+                 self.project_entries.get(id, []), "time-entries", params)),
+            ("time_entries.json", r"^time_entries\.json$",
+             lambda params: self.paged(self.entries, "time-entries", params)),
+            ("portfolio/boards.json", r"^portfolio/boards\.json$",
+             lambda params: ({"boards": self.boards}, {})),
+            ("portfolio/boards/{id}/columns.json",
+             r"^portfolio/boards/(?P<id>[^/]+)/columns\.json$",
+             lambda params, id: ({"columns": self.columns.get(id, [])}, {})),
+            ("portfolio/columns/{id}/cards.json",
+             r"^portfolio/columns/(?P<id>[^/]+)/cards\.json$",
+             lambda params, id: ({"cards": self.cards.get(id, [])}, {})),
+            ("tags.json", r"^tags\.json$", lambda params: ({"tags": self.tags}, {})),
+        ]
+
+    def _projects(self, params):
+        tag_id = params.get("projectTagIds")
+        projects = [project for project in self.projects
+                    if not tag_id or tag_id in [tag["id"] for tag in project["tags"]]]
+        return {"projects": projects}, {}
+
+    def _projects_by_ids(self, params):
+        ids = [project_id for project_id in params.get("projectIds", "").split(",")
+               if project_id in self.projects_by_id]
+        page = int(params.get("page", 1))
+        page_size = int(params.get("pageSize", 50))
+        chunk = ids[(page - 1) * page_size:page * page_size]
+        fields = params.get("fields[projects]")
+        projects = [self.projects_by_id[project_id] for project_id in chunk]
+        if fields:
+            fields = fields.split(",")
+            projects = [dict((field, project.get(field)) for field in fields)
+                        for project in projects]
+        return {"projects": projects,
+                "meta": {"page": {"hasMore": page * page_size < len(ids)}}}, {}
+
+
+class MockTeamworkServer(ThreadingHTTPServer):
+    """
+    HTTP server answering Teamwork API GETs from an Account, with an optional
+    delay per request and a share of requests answered with 429
+    """
+    daemon_threads = True
+
+    def __init__(self, account, host="127.0.0.1", port=0, latency=0.0,
+                 rate_429=0.0, seed=1):
+        super().__init__((host, port), _Handler)
+        self.account = account
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.routes = [(template, re.compile(pattern), handler)
+                       for template, pattern, handler in account.routes()]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def url(self):
+        return "http://%s:%s" % self.server_address[:2]
+
+    def reset(self):
+        with self._lock:
+            self.requests = collections.Counter()
+            self.throttled = 0
+            self.bytes_out = 0
+
+    def stats(self):
+        with self._lock:
+            return {"requests": dict(self.requests),
+                    "total": sum(self.requests.values()),
+                    "throttled": self.throttled, "bytes_out": self.bytes_out}
+
+    def throttle(self):
+        with self._lock:
+            throttled = self._random.random() < self.rate_429
+            if throttled:
+                self.throttled += 1
+            return throttled
+
+    def start(self):
+        """Serve from a daemon thread, returns the thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't wait for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.lstrip("/")
+        params = dict((name, values[-1]) for name, values in parse_qs(url.query).items())
+        server = self.server
+
+        if path == "__stats__":
+            return self._send(200, server.stats())
+
+        if server.latency:
+            time.sleep(server.latency)
+        if server.throttle():
+            return self._send(429, {"error": "Too many requests"}, {"Retry-After": "0"})
+
+        for template, pattern, handler in server.routes:
+            match = pattern.match(path)
+            if match:
+                with server._lock:
+                    server.requests[template] += 1
+                body, headers = handler(params, **match.groupdict())
+                return self._send(200, body, headers)
+        self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/__reset__":
+            self.server.reset()
+            return self._send(200, {})
+        self._send(404, {"error": "Not found"})
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        if status == 200:
+            with self.server._lock:
+                self.server.bytes_out += len(data)
+
+
+def add_account_arguments(parser):
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--tasks-per-project", type=int, default=50)
+    parser.add_argument("--boards", type=int, default=5)
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds added to every request")
+    parser.add_argument("--rate-429", type=float, default=0.0,
+                        help="Share of requests answered with 429")
+
+
+def account_from_arguments(args):
+    return Account(projects=args.projects, tasks_per_project=args.tasks_per_project,
+                   boards=args.boards, tags=args.tags)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=0)
+    add_account_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockTeamworkServer(account_from_arguments(args), port=args.port,
+                                latency=args.latency, rate_429=args.rate_429)
+    print(server.url)
+    sys.stdout.flush()
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
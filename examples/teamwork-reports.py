@@ -16,6 +16,7 @@ import json
 import click
 import csv
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
@@ -61,7 +62,7 @@ def test_update_task(tw):
     tw.update_task(task_id=17041155, data={"due-date": 20210315})
 
 
-def save_to_gsheet(summary, credentials_file, config):
+def save_to_gsheet(rows, credentials_file, config):
     creds = None
     # The file token.pickle stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
@@ -86,23 +87,22 @@ def save_to_gsheet(summary, credentials_file, config):
             pickle.dump(creds, token)
 
     service = build('sheets', 'v4', credentials=creds)
-    write_data_to_gsheet(service, summary, config)
+    write_data_to_gsheet(service, rows, config)
 
 def write_data_to_gsheet(service, values, config):
-    # Update the data
-    body = {
-        'values': values
-    }
-    # https://developers.google.com/sheets/api/reference/rest/v4/ValueInputOption
-    value_input_option = "USER_ENTERED"
-    result = service.spreadsheets().values(
-    ).update( 
-        spreadsheetId=config.get("SPREADSHEET_ID"), 
-        range=config.get("RANGE_NAME"), 
-        valueInputOption=value_input_option, body=body
-    ).execute()
-
-    print('{0} cells updated.'.format(result.get('updatedCells')))
+    # Rows go out in chunks of CHUNK_ROWS, a few chunks per batchUpdate, so
+    # large exports stay under the request size limit. values can be a
+    # generator, only one batch of rows is held at a time
+    writer = teamwork.SheetWriter(
+        service, config.get("SPREADSHEET_ID"), config.get("RANGE_NAME"),
+        chunk_rows=config.get("CHUNK_ROWS", 500))
+    try:
+        result = writer.write(values, resume_row=config.get("RESUME_ROW"))
+    except teamwork.SheetWriteError as error:
+        # Set "RESUME_ROW" in the config to pick up from where it stopped
+        sys.exit("{0}. Resume from row {1}".format(error, error.next_row))
+
+    print('{0} rows updated.'.format(result["rows"]))
 
 
 @click.command()
@@ -118,16 +118,32 @@ def write_data_to_gsheet(service, values, config):
 @click.option('--saveto', type=click.File("w"), 
               help="Name of file to save output date to")
 @click.option('--format', help="Output format", default="json",
-              type=click.Choice(['json', 'csv', 'gsheet'], 
+              type=click.Choice(['json', 'ndjson', 'csv', 'gsheet'], 
               case_sensitive=False))
 @click.option('--credentials-file', help="Google credentials.json path") 
+@click.option('--cache-dir', 
+              help="Directory to cache API responses in between runs")
+@click.option('--partials-db', 
+              help="SQLite file keeping project summaries between runs, so "
+                   "only changed projects are refetched")
+@click.option('--snapshot', 
+              help="Run the reports offline from this snapshot file")
+@click.option('--dump-snapshot', 
+              help="Save a snapshot of the whole account to this file and exit")
+@click.option('--batch', type=click.File("r"),
+              help=("JSON file with a list of report specs to run, eg. "
+                    '[{"portfolios": [".*"], "format": "csv", "saveto": "boards.csv"}, '
+                    '{"tags": ["tech"], "saveto": "tech.json"}]'))
+@click.option('--jobs', type=int, default=4, 
+              help="Number of --batch reports to run at the same time")
 @click.option('--config-file', 
               help=("Path to configuration file. See the config.json.sample file "
                     "in this repo for example structure"), 
               required=True, type=click.File("r")) 
 def main(all_tasks, all_projects,
          summary, include_projects, tags, portfolios, 
-         saveto, format, credentials_file, config_file):
+         saveto, format, credentials_file, cache_dir, partials_db, snapshot,
+         dump_snapshot, batch, jobs, config_file):
     """Python script to demonstrate connection with the teamwork-python module
 
     The script is primarily used to fetch teamwork content in a consistent 
@@ -142,11 +158,52 @@ def main(all_tasks, all_projects,
 
     """
     config = json.loads(config_file.read())    
-    tw = teamwork.Teamwork(config.get("TEAMWORK_DOMAIN"), config.get("TEAMWORK_API_KEY"))
+    cache = None
+    if cache_dir:
+        cache = teamwork.ResponseCache(backend=teamwork.DiskBackend(cache_dir))
+    tw = teamwork.Teamwork(config.get("TEAMWORK_DOMAIN"), config.get("TEAMWORK_API_KEY"),
+                           cache=cache, lazy=bool(snapshot))
+    if dump_snapshot:
+        counts = teamwork.Snapshot(dump_snapshot).dump(tw)
+        print(json.dumps(counts))
+        return
+    if snapshot:
+        tw.store = teamwork.Snapshot(snapshot)
+    if partials_db:
+        tw.partials = teamwork.PartialStore(partials_db)
     tw.include_projects_in_summary = include_projects
-    tw.output_format = format
+    tw.output_format = client_format(format)
+
+    if batch:
+        run_batch(tw, json.load(batch), jobs)
+        return
+
+    run_report(tw, format, all_tasks, all_projects, summary, portfolios, tags,
+               saveto, credentials_file, config)
+
+
+def client_format(format):
+    """The Teamwork.output_format for a --format, ndjson lines are json"""
+    return "json" if format == "ndjson" else format
+
 
-    if all_tasks:
+def run_report(tw, format, all_tasks=False, all_projects=False, summary=False,
+               portfolios=(), tags=(), saveto=None, credentials_file=None,
+               config=None):
+    """Fetch one report and write it out in format"""
+    if format == "gsheet":
+        # Rows are written to the sheet in chunks as they are fetched
+        save_to_gsheet(iter_report(tw, all_tasks, all_projects, portfolios, tags),
+                       credentials_file, config)
+        return
+    elif format in ["ndjson", "csv"]:
+        # Write and flush each row as soon as it is ready (eg. each page of
+        # tasks or each board), so consumers can start early and a failed
+        # run keeps what it wrote
+        write_rows(iter_report(tw, all_tasks, all_projects, portfolios, tags),
+                   format, saveto or sys.stdout)
+        return
+    elif all_tasks:
         summary = tw.get_tasks(include_portfolios=True)
     elif all_projects:
         summary = tw.get_projects()
@@ -157,12 +214,77 @@ def main(all_tasks, all_projects,
             summary = tw.get_summary_for_tags(tags)
 
     if format == "json": 
-        json.dump(summary, saveto or sys.stdout)
-    elif format == "csv":
-        writer = csv.writer(saveto)
-        writer.writerows(summary)
-    elif format == "gsheet":
-        save_to_gsheet(summary, credentials_file, config)
+        # The summaries' dates are datetime.date
+        json.dump(summary, saveto or sys.stdout, default=str)
+
+
+def iter_report(tw, all_tasks=False, all_projects=False, portfolios=(), tags=()):
+    """The rows of a report, each as soon as it is fetched"""
+    if all_tasks and tw.output_format in ["csv", "gsheet"]:
+        return tw.iter_task_rows(include_portfolios=True)
+    elif all_tasks:
+        return tw.iter_tasks(include_portfolios=True)
+    elif all_projects:
+        return iter(tw.get_projects())
+    elif portfolios:
+        return tw.iter_summary_for_portfolios(portfolios)
+    else:
+        return tw.iter_summary_for_tags(tags)
+
+
+def write_rows(rows, format, saveto):
+    writer = csv.writer(saveto)
+    for row in rows:
+        if format == "ndjson":
+            # The summaries' dates are datetime.date
+            saveto.write(json.dumps(row, default=str) + "\n")
+        else:
+            writer.writerow(row)
+        saveto.flush()
+
+
+def run_batch(tw, specs, jobs):
+    """
+    Run many reports on a thread pool. They share tw's connections, cache and
+    memoized project summaries, so each project is fetched once for all of
+    them and the batch takes about as long as its slowest report.
+
+    Each spec is a dict with "portfolios", "tags", "all_tasks" or
+    "all_projects", and optionally "format" (json, ndjson or csv), "saveto"
+    (a file path, stdout by default) and "include_projects".
+
+    tw.max_workers is split between the jobs, so the whole batch sends at
+    most that many requests at once, within the connection pool.
+    """
+    for spec in specs:
+        if spec.get("format", "json") not in ["json", "ndjson", "csv"]:
+            raise click.UsageError(
+                "Batch reports can only be json, ndjson or csv: %s" % spec)
+
+    jobs = max(1, min(jobs, tw.max_workers))
+    workers_per_job = max(1, tw.max_workers // jobs)
+
+    def run(spec):
+        format = spec.get("format", "json")
+        client = tw.with_options(
+            max_workers=workers_per_job,
+            output_format=client_format(format),
+            include_projects_in_summary=spec.get("include_projects", False))
+        saveto = open(spec["saveto"], "w", newline="") if spec.get("saveto") else None
+        try:
+            run_report(client, format, all_tasks=spec.get("all_tasks", False),
+                       all_projects=spec.get("all_projects", False),
+                       summary=bool(spec.get("portfolios") or spec.get("tags")),
+                       portfolios=spec.get("portfolios") or (),
+                       tags=spec.get("tags") or (), saveto=saveto)
+        finally:
+            if saveto:
+                saveto.close()
+        return spec.get("saveto") or "stdout"
+
+    with tw.run(), ThreadPoolExecutor(max_workers=jobs) as executor:
+        for target in executor.map(run, specs):
+            print("Wrote %s" % target, file=sys.stderr)
 
 
 if __name__ == "__main__":
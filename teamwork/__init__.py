@@ -1 +1,37 @@
+import importlib
+
 from .teamwork import Teamwork, timedelta_to_hours_minutes, time_to_hhmm
+from .index import ProjectIndex
+from .memo import RunMemo, SingleFlight
+from .records import Task, Project, TimeEntry, PortfolioBoard
+from .catalog import NameCatalog
+from .metrics import Metrics
+
+# Imported on first use, so scripts that don't need them skip asyncio,
+# sqlite3, gzip and friends
+_LAZY = {
+    "AsyncTeamwork": ".aio",
+    "ResponseCache": ".cache",
+    "MemoryBackend": ".cache",
+    "DiskBackend": ".cache",
+    "LocalSource": ".store",
+    "SyncStore": ".store",
+    "RateLimiter": ".ratelimit",
+    "Snapshot": ".snapshot",
+    "PartialStore": ".partials",
+    "SheetWriter": ".gsheet",
+    "SheetWriteError": ".gsheet",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,229 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .teamwork import Teamwork
+from .index import ProjectIndex
+from .records import Task
+from . import summary
+
+
+class AsyncTeamwork(object):
+    """
+    asyncio flavour of the Teamwork client.
+
+    Mirrors the read methods of ``Teamwork`` as coroutines. Requests still go
+    through the (pooled) transport of a regular ``Teamwork`` client, but run
+    on a worker pool so that up to ``concurrency`` of them are in flight at
+    once. The summary methods fan out across boards, columns and projects and
+    then fold the results in the same order as the synchronous client, so
+    their output is identical.
+
+        >>> tw = AsyncTeamwork('company.teamwork.com', 'API_KEY')
+        >>> summary = asyncio.run(tw.get_summary_for_portfolios(['.*']))
+    """
+    def __init__(self, domain=None, api_key=None, concurrency=20, client=None,
+                 **kwargs):
+        """
+        :param: domain: Teamwork domain, eg. company.teamwork.com
+        :param: api_key: Teamwork API key
+        :param: concurrency: Maximum number of requests in flight at once
+        :param: client: Existing ``Teamwork`` client to wrap instead of
+            creating a new one
+        :param: kwargs: Passed on to ``Teamwork()``
+        """
+        if client is None:
+            kwargs.setdefault("pool_size", concurrency)
+            client = Teamwork(domain, api_key, **kwargs)
+        self.client = client
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        # One semaphore per event loop, a semaphore can't be shared
+        # between the loops of separate asyncio.run() calls
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def output_format(self):
+        return self.client.output_format
+
+    @output_format.setter
+    def output_format(self, value):
+        self.client.output_format = value
+
+    @property
+    def include_projects_in_summary(self):
+        return self.client.include_projects_in_summary
+
+    @include_projects_in_summary.setter
+    def include_projects_in_summary(self, value):
+        self.client.include_projects_in_summary = value
+
+    def run(self):
+        """Context for a report run, see ``Teamwork.run``"""
+        return self.client.run()
+
+    async def _call(self, func, *args, **kwargs):
+        """Run a blocking client call on the worker pool"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            return await loop.run_in_executor(
+                self._executor, lambda: func(*args, **kwargs))
+
+    async def get(self, path=None, params=None):
+        return await self._call(self.client.get, path, params=params)
+
+    async def get_projects(self, payload=None):
+        return await self._call(self.client.get_projects, dict(payload or {}))
+
+    async def get_project_times(self, project_id, user_id=None,
+                                start_date=None, end_date=None):
+        return await self._call(
+            self.client.get_project_times, project_id, user_id=user_id,
+            start_date=start_date, end_date=end_date)
+
+    async def get_tasks_for_project(self, project_id):
+        return await self._call(self.client.get_tasks_for_project, project_id)
+
+    async def get_tasks(self, include_portfolios=False, records=False):
+        """
+        Get all tasks across all projects
+
+        See ``Teamwork.get_tasks``
+        """
+        tasks = []
+        # The tasks api returns 250 at a time paginated
+        pages = await self._get_pages(
+            'tasks.json', self.client._tasks_payload(), "todo-items")
+        for tasks_page in pages:
+            if records:
+                tasks_page = Task.from_api_list(tasks_page)
+            tasks.extend(tasks_page)
+
+        if include_portfolios:
+            projects = await self.get_projects(
+                payload={"include": ["portfolioBoards"]})
+            self.client._add_project_fields(tasks, ProjectIndex(projects))
+
+        if self.output_format == "json":
+            return tasks
+        elif self.output_format in ["gsheet", "csv"]:
+            return self.client._tasks_to_rows(tasks)
+
+    async def get_summary_for_tags(self, tag_names=[]):
+        """
+        Get summary of tasks, progress, and estimates by tag value
+
+        See ``Teamwork.get_summary_for_tags``
+        """
+        tags = await self._call(self.client._tags_by_name, tag_names)
+        memo = self.client._runs.current()
+
+        async def summarize(tag):
+            projects = await self._call(self.client._tagged_projects, tag, memo)
+            projects_summary = await self._summarize_projects(projects, memo)
+            return self.client._tag_summary(tag, projects_summary)
+
+        return list(await asyncio.gather(*[summarize(tag) for tag in tags]))
+
+    async def get_summary_for_portfolios(self, portfolios):
+        """
+        Fetch the project summary for matching portfolio boards
+
+        See ``Teamwork.get_summary_for_portfolios``
+        """
+        boards = await self._call(self.client._portfolios_by_name, portfolios)
+        memo = self.client._runs.current()
+
+        board_projects = await self._projects_in_portfolio_boards(
+            [board.get("id") for board in boards])
+        projects_summaries = await asyncio.gather(*[
+            self._summarize_projects(projects, memo) for projects in board_projects])
+
+        board_summaries = []
+        if self.output_format in ["gsheet", "csv"]:
+            # Add the header row
+            board_summaries.append(self.client.SUMMARY_FIELDS)
+        for board, projects_summary in zip(boards, projects_summaries):
+            board_summaries.append(
+                self.client._board_summary(board, projects_summary))
+
+        return board_summaries
+
+    #--------------------------------------------
+    # Internal / Private methods
+    #--------------------------------------------
+    async def _get_pages(self, path, params, key):
+        """
+        Fetch the ``key`` items of every page of a paginated endpoint.
+
+        Reads X-Pages from the first page and requests the rest at once.
+        Without the header, pages are requested ``concurrency`` at a time
+        until an empty one comes back.
+        """
+        result, headers = await self._call(
+            self.client._get, path, params=dict(params, page=1))
+        items = result.get(key)
+        if not items:
+            return []
+        pages = [items]
+
+        if headers.get("X-Pages") is not None:
+            results = await asyncio.gather(*[
+                self.get(path, params=dict(params, page=page))
+                for page in range(2, int(headers.get("X-Pages")) + 1)])
+            return pages + [result.get(key) or [] for result in results]
+
+        page = 2
+        while True:
+            results = await asyncio.gather(*[
+                self.get(path, params=dict(params, page=number))
+                for number in range(page, page + self.concurrency)])
+            for result in results:
+                items = result.get(key)
+                if not items:
+                    # No more items to fetch
+                    return pages
+                pages.append(items)
+            page += self.concurrency
+
+    async def _projects_in_portfolio_boards(self, board_ids):
+        """See ``Teamwork._projects_in_portfolio_boards``"""
+        client = self.client
+        board_columns = await asyncio.gather(*[
+            self._call(client._board_column_ids, board_id)
+            for board_id in board_ids])
+        column_ids = [column_id for column_ids in board_columns
+                      for column_id in column_ids]
+        column_project_ids = dict(zip(column_ids, await asyncio.gather(*[
+            self._call(client._column_project_ids, column_id)
+            for column_id in column_ids])))
+
+        chunks = client._project_id_chunks(
+            [project_id for project_ids in column_project_ids.values()
+             for project_id in project_ids])
+        projects = ProjectIndex()
+        for chunk_projects in await asyncio.gather(*[
+                self._call(client._fetch_projects_chunk, chunk)
+                for chunk in chunks]):
+            projects.update(chunk_projects)
+
+        return client._board_projects(board_columns, column_project_ids, projects)
+
+    async def _summarize_projects(self, projects, memo):
+        today = summary.today_yyyymmdd()
+        memo.retain("partial", lambda key: key[2] == today)
+        partials = await asyncio.gather(*[
+            self._call(self.client._project_partial, project, today, memo)
+            for project in projects])
+
+        # Merge in project order so the result matches the synchronous client
+        projects_summary = summary.new_summary()
+        for project, partial in zip(projects, partials):
+            self.client._merge_project(projects_summary, project, partial, today)
+        return summary.finalize_summary(projects_summary)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import collections
+
+
+# Seconds that responses of each endpoint are served from the cache without
+# asking the API. Matched against the request path, first match wins.
+DEFAULT_TTLS = [
+    (r"^authenticate\.json$", None),  # Never cached
+    (r"^tags\.json$", 3600),
+    (r"^portfolio/boards\.json$", 3600),
+    (r"^portfolio/boards/[^/]+/columns\.json$", 900),
+    (r"^portfolio/columns/[^/]+/cards\.json$", 900),
+    (r"^projects(/api/v3/projects)?\.json$", 900),
+    (r"^projects/[^/]+/tasks\.json$", 300),
+    # Paginated endpoints are not cached: pages expire independently, so a
+    # fresh page 1 mixed with older later pages could drop or repeat items
+    (r"^tasks\.json$", None),
+    (r"^(projects/[^/]+/)?time_entries\.json$", None),
+]
+
+# Cached path prefixes whose responses a successful PUT/POST to a matching
+# path can change. Writes to any other path invalidate the whole cache.
+WRITE_INVALIDATES = [
+    (r"^tasks/", ["tasks", "projects/"]),
+    (r"^projects/[^/]+/time_entries", ["time_entries", "projects/"]),
+    (r"^time_entries", ["time_entries", "projects/"]),
+    (r"^projects", ["projects", "tasks", "portfolio/"]),
+]
+
+# Backend key holding the write invalidation markers
+INVALIDATED_KEY = "__invalidated__"
+
+# Response headers kept with a cached body
+CACHED_HEADERS = ["X-Page", "X-Pages", "X-Records", "ETag", "Last-Modified"]
+
+
+class MemoryBackend(object):
+    """
+    In-process LRU store for cache entries. Entries are kept serialized so
+    callers that modify a returned body can't change the cached copy.
+    """
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(entry)
+
+    def set(self, key, entry):
+        entry = json.dumps(entry)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskBackend(object):
+    """
+    Cache entries stored as one JSON file each in a directory, so they
+    survive between runs. The least recently used files are removed once
+    there are more than ``max_entries``.
+    """
+    def __init__(self, directory, max_entries=10000):
+        self.directory = os.path.expanduser(directory)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        # Counted once here and then tracked, so writes don't list the directory
+        self._count = len(self._names())
+
+    def _names(self):
+        return [name for name in os.listdir(self.directory)
+                if name.endswith(".json")]
+
+    def _path(self, key):
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "%s.json" % name)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        try:
+            # Touch the file so pruning keeps recently used entries
+            os.utime(path, None)
+        except OSError:
+            # Pruned meanwhile by another thread or process
+            pass
+        return entry
+
+    def set(self, key, entry):
+        path = self._path(key)
+        tmp_path = "%s.%s.%s.tmp" % (path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        is_new = not os.path.exists(path)
+        os.replace(tmp_path, path)
+        if is_new:
+            with self._lock:
+                self._count += 1
+                prune = self._count > self.max_entries
+            if prune:
+                self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            return
+        with self._lock:
+            self._count -= 1
+
+    def clear(self):
+        for name in self._names():
+            os.remove(os.path.join(self.directory, name))
+        with self._lock:
+            self._count = 0
+
+    def _prune(self):
+        """
+        Remove the least recently used files down to 90% of max_entries, so
+        the directory is only listed and sorted once every many writes
+        """
+        with self._lock:
+            paths = [os.path.join(self.directory, name) for name in self._names()]
+            keep = int(self.max_entries * 0.9)
+            if len(paths) > keep:
+                paths.sort(key=os.path.getmtime)
+                for path in paths[:len(paths) - keep]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self._count = len(self._names())
+
+
+class ResponseCache(object):
+    """
+    Opt-in cache for GET responses, keyed on path and params.
+
+    Fresh entries are returned without a request. Once an entry's TTL has
+    passed it is revalidated with If-None-Match/If-Modified-Since when the API
+    sent an ETag or Last-Modified, so an unchanged resource costs a 304.
+
+        >>> tw = Teamwork(domain, api_key,
+        ...               cache=ResponseCache(backend=DiskBackend("~/.tw-cache")))
+    """
+    def __init__(self, ttls=None, default_ttl=60, max_entries=1000,
+                 backend=None):
+        """
+        :param: ttls: List of (path regex, seconds) pairs, checked before
+            DEFAULT_TTLS. A TTL of None disables caching for that endpoint
+        :param: default_ttl: TTL for paths that match no pattern
+        :param: max_entries: LRU size bound of the default memory backend
+        :param: backend: MemoryBackend, DiskBackend or compatible object
+        """
+        self.ttls = [(re.compile(pattern), ttl)
+                     for pattern, ttl in list(ttls or []) + DEFAULT_TTLS]
+        self.default_ttl = default_ttl
+        self.backend = backend or MemoryBackend(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        # {path prefix: time of the last write affecting it}
+        self._written = self.backend.get(INVALIDATED_KEY) or {}
+
+    def ttl_for(self, path):
+        path = (path or "").lstrip("/")
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+        return self.default_ttl
+
+    def key(self, path, params):
+        return json.dumps([(path or "").lstrip("/"), params or {}],
+                          sort_keys=True, default=str)
+
+    def lookup(self, path, params):
+        """
+        Return ``(entry, fresh)`` for a request. ``entry`` is None when
+        nothing is cached, ``fresh`` is True when it can be used as is.
+        """
+        if self.ttl_for(path) is None:
+            return None, False
+        entry = self.backend.get(self.key(path, params))
+        if entry is None:
+            self.misses += 1
+            return None, False
+        if time.time() < entry["expires"] and not self._invalidated(path, entry):
+            self.hits += 1
+            return entry, True
+        return entry, False
+
+    def validators(self, entry):
+        """Conditional request headers for a stale entry"""
+        headers = {}
+        if entry and entry["headers"].get("ETag"):
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if entry and entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def store(self, path, params, body, headers):
+        ttl = self.ttl_for(path)
+        if ttl is None:
+            return
+        entry = {
+            "body": body,
+            "headers": dict((name, headers.get(name)) for name in CACHED_HEADERS
+                            if headers.get(name) is not None),
+            "stored": time.time(),
+            "expires": time.time() + ttl,
+        }
+        self.backend.set(self.key(path, params), entry)
+
+    def revalidated(self, path, params, entry):
+        """Mark a stale entry fresh again after a 304 Not Modified"""
+        self.revalidations += 1
+        entry["stored"] = time.time()
+        entry["expires"] = time.time() + (self.ttl_for(path) or 0)
+        self.backend.set(self.key(path, params), entry)
+
+    def invalidate_for_write(self, path):
+        """
+        Mark cached responses that a successful PUT/POST to ``path`` may have
+        changed as stale. They are revalidated on their next use. The markers
+        are saved in the backend, so a DiskBackend carries them over to later
+        runs.
+        """
+        path = (path or "").lstrip("/")
+        prefixes = [""]
+        for pattern, affected in WRITE_INVALIDATES:
+            if re.match(pattern, path):
+                prefixes = affected
+                break
+        for prefix in prefixes:
+            self._written[prefix] = time.time()
+        self.backend.set(INVALIDATED_KEY, self._written)
+
+    def _invalidated(self, path, entry):
+        if not self._written:
+            return False
+        path = (path or "").lstrip("/")
+        return any(path.startswith(prefix) and entry.get("stored", 0) <= written
+                   for prefix, written in list(self._written.items()))
+
+    def invalidate(self, path=None, params=None):
+        """Drop one cached response, or everything when no path is given"""
+        if path is None:
+            self.backend.clear()
+        else:
+            self.backend.delete(self.key(path, params))
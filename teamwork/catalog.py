@@ -0,0 +1,88 @@
+import re
+import time
+import threading
+import functools
+
+
+class NameCatalog(object):
+    """
+    Named items of an account (eg. tags or portfolio boards), fetched once
+    and kept for ``ttl`` seconds.
+
+    Items are indexed by lower-cased name for exact lookups, and a list of
+    name patterns is compiled into one case-insensitive regex, so resolving
+    the patterns is a single pass over the names.
+
+        >>> tags = NameCatalog(lambda: tw.get("tags.json").get("tags"))
+        >>> tags.match(["client-.*", "internal"])
+    """
+    def __init__(self, fetch, ttl=3600, clock=time.monotonic):
+        """
+        :param: fetch: Callable returning the list of item dicts
+        :param: ttl: Seconds before the items are fetched again, None to keep
+            them until ``invalidate()``
+        """
+        self._fetch = fetch
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._items = None
+        self._by_name = {}
+        self._expires = 0.0
+
+    def items(self):
+        """All the items, fetched again once the TTL has passed"""
+        with self._lock:
+            if self._items is None or (
+                    self.ttl is not None and self._clock() >= self._expires):
+                self._load()
+            return self._items
+
+    def _load(self):
+        items = self._fetch() or []
+        by_name = {}
+        for item in items:
+            by_name.setdefault((item.get("name") or "").lower(), []).append(item)
+        self._items = items
+        self._by_name = by_name
+        self._expires = self._clock() + (self.ttl or 0)
+
+    def get(self, name):
+        """The items named exactly ``name``, ignoring case"""
+        self.items()
+        return list(self._by_name.get((name or "").lower(), []))
+
+    def match(self, patterns):
+        """
+        The items whose name matches any of the regex patterns at its start
+        (``re.match``), ignoring case. Each item is returned once, in catalog
+        order.
+        """
+        patterns = tuple(patterns or ())
+        if not patterns:
+            return []
+        matches = _compile(patterns)
+        return [item for item in self.items()
+                if matches(item.get("name") or "")]
+
+    def invalidate(self):
+        with self._lock:
+            self._items = None
+
+    def __len__(self):
+        return len(self.items())
+
+    def __iter__(self):
+        return iter(self.items())
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(patterns):
+    """One match function for a tuple of patterns"""
+    try:
+        regex = re.compile("|".join("(?:%s)" % pattern for pattern in patterns), re.I)
+        return lambda name: regex.match(name) is not None
+    except re.error:
+        # eg. a pattern with inline flags, which must start the whole regex
+        regexes = [re.compile(pattern, re.I) for pattern in patterns]
+        return lambda name: any(regex.match(name) for regex in regexes)
@@ -0,0 +1,148 @@
+import re
+import time
+import random
+import datetime
+
+
+class SheetWriteError(Exception):
+    """
+    Writing rows to a sheet failed for good. ``next_row`` is the first sheet
+    row that wasn't written, to resume from with ``SheetWriter.write()``.
+    """
+    def __init__(self, message, next_row):
+        super().__init__(message)
+        self.next_row = next_row
+
+
+class SheetWriter(object):
+    """
+    Writes rows to a Google Sheet in fixed-size chunks, a few chunks per
+    ``values.batchUpdate`` request, so large exports stay under the API's
+    request size limits and only one batch of rows is held in memory.
+
+    Failed requests (429, 5xx, connection errors) are retried with backoff.
+    If a batch still fails, ``SheetWriteError.next_row`` tells where to
+    resume. Works with the Sheets service from ``googleapiclient`` or any
+    object with the same ``spreadsheets().values().batchUpdate()`` method.
+
+        >>> writer = SheetWriter(service, spreadsheet_id, "TWTasks!A1")
+        >>> writer.write(tw.iter_task_rows(include_portfolios=True))
+
+    The sheet must have enough rows for the data, values.batchUpdate doesn't
+    add rows to a sheet.
+    """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, service, spreadsheet_id, start="Sheet1!A1",
+                 chunk_rows=500, chunks_per_request=10,
+                 value_input_option="USER_ENTERED", max_retries=5,
+                 backoff=1.0, max_backoff=60.0, sleep=time.sleep):
+        """
+        :param: service: Google Sheets v4 service
+        :param: start: Sheet and top-left cell of the data, eg. "TWTasks!A1".
+            A range such as "TWTasks!A1:Q10000" is accepted, only its first
+            cell is used
+        :param: chunk_rows: Rows per range of a batchUpdate request
+        :param: chunks_per_request: Ranges per batchUpdate request
+        :param: max_retries: Retries of a failed request before giving up
+        :param: backoff: Base backoff in seconds, doubled on every retry
+        """
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet, self.column, self.first_row = _parse_start(start)
+        self.chunk_rows = chunk_rows
+        self.chunks_per_request = chunks_per_request
+        self.value_input_option = value_input_option
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        # Requests sent again after a failure
+        self.retries = 0
+
+    def write(self, rows, resume_row=None, on_progress=None):
+        """
+        Write rows, the first one at the start cell
+
+        :param: rows: Iterable of rows (lists of cell values), read as it is
+            written so it can be a generator
+        :param: resume_row: Sheet row to continue from after a failed write
+            (``SheetWriteError.next_row``). The rows before it are skipped
+        :param: on_progress: Called with the next sheet row after every
+            request, eg. to save a checkpoint
+        :returns: Number of rows written and the next sheet row
+        :rtype: dict
+        """
+        row_number = self.first_row
+        written = 0
+        batch = []
+        batch_start = row_number
+        for row in rows:
+            if resume_row is not None and row_number < resume_row:
+                row_number += 1
+                batch_start = row_number
+                continue
+            batch.append([_cell(value) for value in row])
+            row_number += 1
+            if len(batch) >= self.chunk_rows * self.chunks_per_request:
+                self._send(batch_start, batch)
+                written += len(batch)
+                batch, batch_start = [], row_number
+                if on_progress is not None:
+                    on_progress(row_number)
+        if batch:
+            self._send(batch_start, batch)
+            written += len(batch)
+            if on_progress is not None:
+                on_progress(row_number)
+        return {"rows": written, "next_row": row_number}
+
+    def _send(self, start_row, rows):
+        data = []
+        for offset in range(0, len(rows), self.chunk_rows):
+            data.append({
+                "range": "%s!%s%d" % (self.sheet, self.column, start_row + offset),
+                "values": rows[offset:offset + self.chunk_rows],
+            })
+        body = {"valueInputOption": self.value_input_option, "data": data}
+
+        attempt = 0
+        while True:
+            try:
+                return self.service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id, body=body).execute()
+            except Exception as error:
+                if attempt >= self.max_retries or not self._retryable(error):
+                    raise SheetWriteError(
+                        "Writing rows from %s failed: %s" % (start_row, error),
+                        start_row) from error
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            self._sleep(delay)
+            attempt += 1
+            self.retries += 1
+
+    def _retryable(self, error):
+        # googleapiclient's HttpError keeps the response in .resp
+        status = getattr(getattr(error, "resp", None), "status", None)
+        if status is not None:
+            return int(status) in self.RETRY_STATUSES
+        return isinstance(error, (OSError, TimeoutError))
+
+
+def _parse_start(start):
+    """(sheet, column, row) of "Sheet!A1" or "Sheet!A1:Q100" """
+    sheet, _, cell = start.rpartition("!")
+    match = re.match(r"^([A-Za-z]+)(\d*)", cell)
+    if not sheet or not match:
+        raise ValueError("Start cell should look like Sheet1!A1, not %s" % start)
+    return sheet, match.group(1).upper(), int(match.group(2) or 1)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,48 @@
+def normalize_id(value):
+    """
+    Normalize a Teamwork id for use as a lookup key.
+
+    The v1 API returns project ids as str on projects but as int on tasks'
+    "project-id", so every join goes through this one place instead.
+    """
+    if value is None:
+        return None
+    return str(value)
+
+
+class ProjectIndex(object):
+    """
+    Hash index of projects keyed by normalized project id.
+
+    Replaces linear scans over project lists when joining tasks, cards or
+    summaries to their project.
+
+        >>> index = ProjectIndex(tw.get_projects())
+        >>> index.for_task(task).get("name")
+    """
+    def __init__(self, projects=()):
+        self._projects = {}
+        self.update(projects)
+
+    def add(self, project):
+        self._projects[normalize_id(project.get("id"))] = project
+
+    def update(self, projects):
+        for project in projects:
+            self.add(project)
+
+    def get(self, project_id, default=None):
+        return self._projects.get(normalize_id(project_id), default)
+
+    def for_task(self, task, default=None):
+        """The project a v1 task belongs to"""
+        return self.get(task.get("project-id"), default)
+
+    def __contains__(self, project_id):
+        return normalize_id(project_id) in self._projects
+
+    def __iter__(self):
+        return iter(self._projects.values())
+
+    def __len__(self):
+        return len(self._projects)
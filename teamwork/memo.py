@@ -0,0 +1,179 @@
+import weakref
+import threading
+import contextlib
+
+
+class RunMemo(object):
+    """
+    Values computed once per report run, eg. a project's task list and
+    partial summary, shared by every board and tag that includes the project.
+
+    Concurrent callers asking for the same key wait for the first one instead
+    of computing it again.
+    """
+    def __init__(self):
+        self._values = {}
+        self._pending = {}
+        # Pending keys invalidated while they were computed
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """Return the value for key, calling compute() if it isn't known yet"""
+        while True:
+            with self._lock:
+                if key in self._values:
+                    return self._values[key]
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    break
+            # Someone else is computing it. If they fail, try ourselves
+            event.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                # Invalidated meanwhile: the value may predate the change,
+                # keep it for this caller only
+                if key in self._stale:
+                    self._stale.discard(key)
+                else:
+                    self._values[key] = value
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._stale.discard(key)
+            event.set()
+
+    def invalidate(self, kind=None, item_id=None):
+        """
+        Forget memoized values: all of them, all of one kind (eg. "tasks"),
+        or those of one item of a kind
+        """
+        def matches(key):
+            return ((kind is None or key[0] == kind) and
+                    (item_id is None or key[1] == item_id))
+
+        with self._lock:
+            for key in list(self._values):
+                if matches(key):
+                    del self._values[key]
+            self._stale.update(key for key in self._pending if matches(key))
+
+    def retain(self, kind, keep):
+        """Forget the values of one kind whose key keep(key) rejects"""
+        with self._lock:
+            for key in list(self._values):
+                if key[0] == kind and not keep(key):
+                    del self._values[key]
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._values)
+
+
+class RunScope(object):
+    """
+    The report run in progress on a client, shared with its ``with_options()``
+    copies.
+
+    Inside ``run()`` every call shares one RunMemo. Outside a run each
+    top-level call gets a fresh one, so nothing outlives the call.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._depth = 0
+        self.memo = None
+        # Every memo in use, so writes can invalidate them all
+        self._memos = weakref.WeakSet()
+
+    @contextlib.contextmanager
+    def run(self):
+        with self._lock:
+            if self.memo is None:
+                self.memo = RunMemo()
+                self._memos.add(self.memo)
+            self._depth += 1
+            memo = self.memo
+        try:
+            yield memo
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if not self._depth:
+                    self.memo = None
+
+    def current(self):
+        """The memo of the run in progress, or a new one for a single call"""
+        with self._lock:
+            if self.memo is not None:
+                return self.memo
+            memo = RunMemo()
+            self._memos.add(memo)
+            return memo
+
+    def invalidate(self, kind=None, item_id=None):
+        with self._lock:
+            memos = list(self._memos)
+        for memo in memos:
+            memo.invalidate(kind, item_id)
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls for the same key: while one caller runs a
+    call, others asking for the same key wait for its result instead of
+    running it again. Nothing is kept once the call returns.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        # Number of calls answered by another caller's call
+        self.shared = 0
+
+    def do(self, key, call):
+        """
+        Return ``(value, shared)``, where shared is True when other callers
+        got the same value object, so it must be copied before being modified.
+        The call's exception is raised to every caller
+        """
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight()
+            else:
+                flight.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        try:
+            flight.value = call()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            flight.done.set()
+        # No one can join the flight once it is removed from _calls
+        return flight.value, flight.waiters > 0
+
+
+class _Flight(object):
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.value = None
+        self.error = None
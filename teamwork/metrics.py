@@ -0,0 +1,148 @@
+import re
+import threading
+import collections
+
+
+# Path segments that are ids, eg. projects/123/tasks.json or tasks/5.json
+_ID_SEGMENT = re.compile(r"(^|/)\d+(?=/|\.json$|$)")
+
+
+def endpoint_template(path):
+    """
+    The endpoint a request path belongs to, with ids replaced by {id}
+
+        >>> endpoint_template("/projects/123/tasks.json")
+        'projects/{id}/tasks.json'
+    """
+    return _ID_SEGMENT.sub(r"\1{id}", (path or "").lstrip("/"))
+
+
+class Metrics(object):
+    """
+    Request counters and latency histograms per method and endpoint template,
+    fed by the Teamwork client for every request it sends or answers from
+    its cache.
+
+        >>> tw.metrics.as_dict()["GET projects/{id}/tasks.json"]["requests"]
+        >>> print(tw.metrics.to_prometheus())
+    """
+    # Upper bounds of the latency histogram buckets, in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def observe(self, event):
+        """
+        Count one request
+
+        :param: event: Dict with the ``method``, ``endpoint``, ``status``
+            (None when the request failed), ``seconds``, ``bytes_in``,
+            ``bytes_out``, ``retries`` and ``cache`` ("hit" when answered
+            from the cache, else None)
+        """
+        key = "%s %s" % (event["method"], event["endpoint"])
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = {
+                    "method": event["method"],
+                    "endpoint": event["endpoint"],
+                    "requests": 0,
+                    "statuses": collections.Counter(),
+                    "errors": 0,
+                    "seconds": 0.0,
+                    "buckets": [0] * (len(self.BUCKETS) + 1),
+                    "bytes_in": 0,
+                    "bytes_out": 0,
+                    "retries": 0,
+                    "cache_hits": 0,
+                }
+            if event.get("cache") == "hit":
+                stats["cache_hits"] += 1
+                return
+            stats["requests"] += 1
+            if event.get("status") is None:
+                stats["errors"] += 1
+            else:
+                stats["statuses"][event["status"]] += 1
+            seconds = event.get("seconds") or 0.0
+            stats["seconds"] += seconds
+            stats["buckets"][_bucket(self.BUCKETS, seconds)] += 1
+            stats["bytes_in"] += event.get("bytes_in") or 0
+            stats["bytes_out"] += event.get("bytes_out") or 0
+            stats["retries"] += event.get("retries") or 0
+
+    def as_dict(self):
+        """
+        The counters as ``{"METHOD endpoint": stats}``. The latency histogram
+        is cumulative, keyed by bucket upper bound ("+Inf" last)
+        """
+        with self._lock:
+            result = {}
+            for key, stats in self._endpoints.items():
+                stats = dict(stats, statuses=dict(stats["statuses"]))
+                buckets = stats.pop("buckets")
+                cumulative = 0
+                stats["latency"] = collections.OrderedDict()
+                for bound, count in zip(
+                        [str(bound) for bound in self.BUCKETS] + ["+Inf"], buckets):
+                    cumulative += count
+                    stats["latency"][bound] = cumulative
+                result[key] = stats
+            return result
+
+    def to_prometheus(self, prefix="teamwork"):
+        """The counters in the Prometheus text exposition format"""
+        endpoints = self.as_dict()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+            for suffix, labels, value in samples:
+                label_text = ",".join('%s="%s"' % (label, _escape(label_value))
+                                      for label, label_value in labels)
+                lines.append("%s_%s%s{%s} %s" % (prefix, name, suffix, label_text, value))
+
+        def labels(stats, **extra):
+            return [("method", stats["method"]), ("endpoint", stats["endpoint"])] + \
+                sorted(extra.items())
+
+        stats_list = list(endpoints.values())
+        metric("requests_total", "counter", "Requests sent, by response status",
+               [("", labels(stats, status=status), count)
+                for stats in stats_list
+                for status, count in sorted(stats["statuses"].items(), key=str)] +
+               [("", labels(stats, status="error"), stats["errors"])
+                for stats in stats_list if stats["errors"]])
+        metric("request_seconds", "histogram", "Request latency",
+               [sample for stats in stats_list for sample in
+                [("_bucket", labels(stats, le=bound), count)
+                 for bound, count in stats["latency"].items()] +
+                [("_sum", labels(stats), round(stats["seconds"], 6)),
+                 ("_count", labels(stats), stats["requests"])]])
+        for name, field, help_text in [
+                ("response_bytes_total", "bytes_in", "Response body bytes received"),
+                ("request_bytes_total", "bytes_out", "Request body bytes sent"),
+                ("retries_total", "retries", "Requests sent again after a failure"),
+                ("cache_hits_total", "cache_hits", "Requests answered from the cache")]:
+            metric(name, "counter", help_text,
+                   [("", labels(stats), stats[field]) for stats in stats_list])
+        return "\n".join(lines) + "\n"
+
+
+def _bucket(bounds, seconds):
+    for number, bound in enumerate(bounds):
+        if seconds <= bound:
+            return number
+    return len(bounds)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
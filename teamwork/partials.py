@@ -0,0 +1,70 @@
+import json
+import sqlite3
+import threading
+
+from .index import normalize_id
+
+
+class PartialStore(object):
+    """
+    Per-project partial summaries kept between report runs, keyed on each
+    project's last-changed stamp.
+
+    Assign one to ``Teamwork.partials`` and the summaries only fetch the
+    tasks of projects whose stamp changed since their partial was stored.
+    Projects that don't report a stamp are always refetched. The stored
+    partials don't depend on the day, so late counts stay right from one day
+    to the next.
+
+        >>> tw.partials = PartialStore('partials.db')
+        >>> tw.get_summary_for_portfolios(['.*'])
+    """
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS partials ("
+                " project_id TEXT PRIMARY KEY, stamp TEXT, data TEXT)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, project_id, stamp):
+        """The stored partial state of a project, None if its stamp changed"""
+        if not stamp:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM partials WHERE project_id = ? AND stamp = ?",
+                (normalize_id(project_id), str(stamp))).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def save(self, project_id, stamp, state):
+        if not stamp:
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO partials (project_id, stamp, data)"
+                " VALUES (?, ?, ?)",
+                (normalize_id(project_id), str(stamp), json.dumps(state)))
+
+    def invalidate(self, project_id=None):
+        """Forget one project's partial, or all of them"""
+        with self._lock, self._db:
+            if project_id is None:
+                self._db.execute("DELETE FROM partials")
+            else:
+                self._db.execute("DELETE FROM partials WHERE project_id = ?",
+                                 (normalize_id(project_id),))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM partials").fetchone()[0]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,123 @@
+import time
+import random
+import threading
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by every thread (and AsyncTeamwork task) that uses a
+    transport.
+
+    Tokens refill at ``rate`` requests per ``per`` seconds. The bucket is
+    adjusted from Teamwork's X-Rate-Limit-* response headers (X-RateLimit-*
+    is read too), so requests slow down before the API starts answering 429,
+    and a 429/5xx pauses all callers for a jittered exponential backoff.
+    """
+    # Status codes worth retrying. 5xx are only retried for idempotent methods
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, rate=150, per=60.0, max_retries=5, backoff=1.0,
+                 max_backoff=60.0, sleep=time.sleep, clock=time.monotonic,
+                 wall_clock=time.time):
+        """
+        :param: rate: Requests allowed per ``per`` seconds until the API
+            reports its own limit
+        :param: per: Length of the rate window in seconds
+        :param: max_retries: Retries of a request before giving up
+        :param: backoff: Base backoff in seconds, doubled on every retry
+        :param: max_backoff: Upper bound of a single backoff
+        :param: wall_clock: Epoch time, for reset headers that are a
+            timestamp rather than a number of seconds
+        """
+        self.rate = rate
+        self.per = per
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._lock = threading.Lock()
+        self._tokens = float(rate)
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(float(self.rate),
+                           self._tokens + elapsed * self.rate / self.per)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                if wait <= 0:
+                    wait = (1 - self._tokens) * self.per / self.rate
+            self._sleep(wait)
+
+    def update(self, headers):
+        """Adjust the bucket to the limits reported by the API"""
+        limit = _rate_header(headers, "Limit")
+        remaining = _rate_header(headers, "Remaining")
+        reset = _rate_header(headers, "Reset")
+        with self._lock:
+            if limit:
+                self.rate = limit
+            if remaining is not None:
+                self._tokens = min(self._tokens, float(remaining))
+                if remaining <= 0 and reset:
+                    self._paused_until = max(self._paused_until,
+                                             self._clock() + self._reset_delay(reset))
+
+    def _reset_delay(self, reset):
+        """
+        Seconds until the window resets. A reset longer than the window is
+        taken as an epoch timestamp. Never more than the window or
+        max_backoff, whichever is longer
+        """
+        if reset > self.per:
+            reset = reset - self._wall_clock()
+        return min(max(0.0, reset), max(self.per, self.max_backoff))
+
+    def retry_delay(self, attempt, retry_after=None):
+        """
+        Full-jitter exponential backoff for a retry, never shorter than the
+        API's Retry-After
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def pause(self, delay):
+        """Hold back every caller for ``delay`` seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + delay)
+
+    def should_retry(self, method, status_code, attempt):
+        if attempt >= self.max_retries:
+            return False
+        if status_code == 429:
+            return True
+        # A failed POST may still have created the record
+        return status_code in self.RETRY_STATUSES and method != "POST"
+
+
+def _rate_header(headers, name):
+    """X-Rate-Limit-<name> or X-RateLimit-<name> as an int"""
+    for header in ("X-Rate-Limit-" + name, "X-RateLimit-" + name):
+        try:
+            return int(headers.get(header))
+        except (TypeError, ValueError):
+            pass
+    return None
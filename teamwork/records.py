@@ -0,0 +1,126 @@
+"""
+Compact records for the API objects that reports hold on to.
+
+The API returns tasks and projects with dozens of fields, of which the
+summaries and CSV outputs read a handful. Records keep only those fields, in
+``__slots__`` instead of a per-object dict, and still answer ``get()`` and
+``[]`` with the API's field names so they can be used where the raw dicts
+were.
+
+    >>> task = Task.from_api(raw_task)
+    >>> task.get("due-date"), task.due_date
+"""
+
+
+def _attribute(field):
+    """Slot name of an API field name, eg. "start-date" -> "start_date" """
+    return field.replace("-", "_")
+
+
+class RecordType(type):
+    """Builds the __slots__ of a record class from its FIELDS"""
+    def __new__(mcs, name, bases, namespace):
+        fields = namespace.get("FIELDS", ())
+        namespace["__slots__"] = tuple(_attribute(field) for field in fields)
+        namespace["_ATTRIBUTES"] = dict(
+            (field, _attribute(field)) for field in fields)
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class Record(object, metaclass=RecordType):
+    """
+    Base class of the records. Subclasses list the API field names they keep
+    in FIELDS, any other field of the API object is dropped.
+    """
+    FIELDS = ()
+
+    def __init__(self, **values):
+        for field, attribute in self._ATTRIBUTES.items():
+            setattr(self, attribute, values.get(attribute))
+
+    @classmethod
+    def from_api(cls, data):
+        """Record of an API object, keeping only the fields in FIELDS"""
+        record = cls.__new__(cls)
+        for field, attribute in cls._ATTRIBUTES.items():
+            setattr(record, attribute, data.get(field))
+        return record
+
+    @classmethod
+    def from_api_list(cls, items):
+        return [cls.from_api(item) for item in items or []]
+
+    def get(self, field, default=None):
+        attribute = self._ATTRIBUTES.get(field)
+        if attribute is None:
+            return default
+        value = getattr(self, attribute)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, self._ATTRIBUTES[field])
+        except KeyError:
+            raise KeyError(field)
+
+    def __setitem__(self, field, value):
+        try:
+            setattr(self, self._ATTRIBUTES[field], value)
+        except KeyError:
+            raise KeyError("%s doesn't keep %s" % (type(self).__name__, field))
+
+    def __contains__(self, field):
+        return field in self._ATTRIBUTES
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "%s(id=%r)" % (type(self).__name__, self.get("id"))
+
+    def keys(self):
+        return list(self.FIELDS)
+
+    def to_dict(self):
+        """The record as a dict with the API's field names, eg. for JSON"""
+        return dict((field, getattr(self, attribute))
+                    for field, attribute in self._ATTRIBUTES.items())
+
+
+class Task(Record):
+    """A v1 todo-item with the fields used by summaries and CSV rows"""
+    FIELDS = (
+        "id", "content", "status", "completed", "start-date", "due-date",
+        "progress", "estimated-minutes",
+        "creator-firstname", "creator-lastname", "project-id", "project-name",
+        "responsible-party-names",
+        # Set from the task's project by Teamwork._add_project_fields()
+        "project-owner", "project-start-date", "project-end-date",
+        "project-status", "portfolioBoards",
+    )
+
+
+class Project(Record):
+    """A project with the fields used by summaries and task joins"""
+    FIELDS = (
+        "id", "name", "startDate", "endDate", "status", "subStatus",
+        "owner", "portfolioBoards",
+    )
+    # Fields requested from the v3 projects endpoint, which supports
+    # fields[projects]=...
+    API_FIELDS = ("id", "name", "startDate", "endDate", "status", "subStatus")
+
+
+class TimeEntry(Record):
+    """A v1 time-entry"""
+    FIELDS = (
+        "id", "project-id", "todo-item-id", "person-id", "date", "hours",
+        "minutes", "description", "isbillable",
+    )
+
+
+class PortfolioBoard(Record):
+    """A portfolio board"""
+    FIELDS = ("id", "name")
@@ -0,0 +1,135 @@
+import os
+import gzip
+import json
+import itertools
+import threading
+import collections
+
+from .index import normalize_id
+from .store import LocalSource
+
+
+class Snapshot(LocalSource):
+    """
+    Compressed, append-only file holding a whole account, for running
+    reports offline.
+
+    Records are written in blocks of one record type and parent (eg. the
+    tasks of one project). Each block is a gzip member of JSON lines, so a
+    block can be appended without rewriting the file, and a block is read
+    without decompressing the rest. The offset of each block is kept in a
+    JSON lines index next to the file (``<path>.index``).
+
+        >>> snapshot = Snapshot('account.jsonl.gz')
+        >>> snapshot.dump(tw)
+        >>> tw.store = Snapshot('account.jsonl.gz')
+        >>> tw.get_summary_for_tags(['.*'])
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.index_path = self.path + ".index"
+        self._lock = threading.Lock()
+        # {(kind, parent_id): [block, ...]} and {kind: [block, ...]} in file order
+        self._blocks = collections.defaultdict(list)
+        self._kind_blocks = collections.defaultdict(list)
+        # {offset: [json line, ...]} of the blocks read so far
+        self._lines = {}
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path) and os.path.exists(self.path):
+            self._rebuild_index()
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    if line.strip():
+                        self._add_block(json.loads(line))
+
+    def _rebuild_index(self):
+        """Rewrite the data file with a new index, when the index was lost"""
+        rebuilt = Snapshot(self.path + ".rebuild")
+        rebuilt.clear()
+        with gzip.open(self.path, "rt") as f:
+            rows = (json.loads(line) for line in f if line.strip())
+            for (kind, parent), group in itertools.groupby(
+                    rows, key=lambda row: (row[0], row[1])):
+                rebuilt.append(kind, [row[2] for row in group], parent)
+        os.replace(rebuilt.path, self.path)
+        os.replace(rebuilt.index_path, self.index_path)
+
+    def _add_block(self, block):
+        self._blocks[(block["kind"], block["parent"])].append(block)
+        self._kind_blocks[block["kind"]].append(block)
+
+    def append(self, kind, records, parent_id=None):
+        """Add records of one kind (and parent) to the end of the snapshot"""
+        parent = normalize_id(parent_id)
+        lines = [json.dumps([kind, parent, record]) for record in records]
+        if not lines:
+            return
+        data = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+        with self._lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+            block = {"kind": kind, "parent": parent, "offset": offset,
+                     "size": len(data), "count": len(lines)}
+            with open(self.index_path, "a") as f:
+                f.write(json.dumps(block) + "\n")
+            self._add_block(block)
+
+    def append_by(self, kind, records, parent_key):
+        """
+        Append records whose parent id is in the ``parent_key`` field, one
+        block per run of records with the same parent so their order is kept
+        """
+        for parent_id, group in itertools.groupby(
+                records, key=lambda record: normalize_id(record.get(parent_key))):
+            self.append(kind, list(group), parent_id)
+
+    def records(self, kind, parent_id=None):
+        if parent_id is None:
+            blocks = self._kind_blocks.get(kind, [])
+        else:
+            blocks = self._blocks.get((kind, normalize_id(parent_id)), [])
+        # Parsed on every call, callers may modify the records they get
+        return [json.loads(line)[2]
+                for block in list(blocks) for line in self._block_lines(block)]
+
+    def _block_lines(self, block):
+        offset = block["offset"]
+        lines = self._lines.get(offset)
+        if lines is None:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read(block["size"])
+            lines = gzip.decompress(data).decode("utf-8").splitlines()
+            self._lines[offset] = lines
+        return lines
+
+    def clear(self):
+        """Remove the snapshot's files and records"""
+        with self._lock:
+            for path in [self.path, self.index_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._blocks.clear()
+            self._kind_blocks.clear()
+            self._lines.clear()
+
+    def dump(self, client):
+        """
+        Replace the snapshot with the account's current records
+
+        :param: client: Teamwork client to fetch with. Its own ``store`` and
+            ``cache`` are bypassed while dumping
+        :returns: Number of records written per record type
+        :rtype: dict
+        """
+        self.clear()
+        counts = dict((kind, 0) for kind in self.KINDS if kind != "account")
+        for kind, parent_id, records in self.pull(client):
+            self.append(kind, records, parent_id)
+            if kind in counts:
+                counts[kind] += len(records)
+        return counts
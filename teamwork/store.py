@@ -0,0 +1,333 @@
+import re
+import abc
+import json
+import sqlite3
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+
+from .index import normalize_id
+
+
+class LocalSource(abc.ABC):
+    """
+    Answers Teamwork GET requests from locally held records instead of the
+    API, in the same JSON shape the API returns.
+
+    Assign one to ``Teamwork.store`` and ``get_tasks``, ``get_projects``,
+    ``get_tasks_for_project`` and the summary methods run against it with no
+    network calls. Subclasses implement ``records()``.
+    """
+    # Record types, in the order pull() fetches them
+    KINDS = ["account", "projects", "tasks", "time_entries", "tags", "boards",
+             "columns", "cards"]
+
+    ROUTES = [
+        (r"^authenticate\.json$", "_answer_account"),
+        (r"^tasks\.json$", "_answer_tasks"),
+        (r"^projects\.json$", "_answer_projects"),
+        (r"^projects/api/v3/projects\.json$", "_answer_projects_by_id"),
+        (r"^projects/(?P<project_id>[^/]+)/tasks\.json$", "_answer_project_tasks"),
+        (r"^projects/(?P<project_id>[^/]+)/time_entries\.json$", "_answer_time_entries"),
+        (r"^time_entries\.json$", "_answer_time_entries"),
+        (r"^portfolio/boards\.json$", "_answer_boards"),
+        (r"^portfolio/boards/(?P<board_id>[^/]+)/columns\.json$", "_answer_columns"),
+        (r"^portfolio/columns/(?P<column_id>[^/]+)/cards\.json$", "_answer_cards"),
+        (r"^tags\.json$", "_answer_tags"),
+    ]
+
+    @abc.abstractmethod
+    def records(self, kind, parent_id=None):
+        """
+        Return the stored records of one kind, in their original order
+
+        :param: kind: One of projects, tasks, boards, columns, cards, tags,
+            time_entries or account
+        :param: parent_id: Only records of this project (tasks, time
+            entries), board (columns) or column (cards)
+        """
+
+    def pull(self, client, since=None):
+        """
+        Walk the account through the API, yielding ``(kind, parent_id,
+        records)`` in KINDS order
+
+        parent_id is None for the account, projects, tags and boards, which
+        are yielded whole. Tasks and time entries are yielded page by page,
+        in runs of records of the same project. Columns come once per board,
+        and the cards of each column follow their board's columns.
+
+        :param: client: Teamwork client to fetch with. Its own ``store`` and
+            ``cache`` are bypassed while pulling, a cached response could hide
+            recent changes
+        :param: since: Only tasks and time entries changed after this UTC
+            time (YYYYMMDDHHMMSS)
+        """
+        changed = {"updatedAfterDate": since} if since else {}
+        store, client.store = client.store, None
+        cache, client.cache = client.cache, None
+        try:
+            yield "account", None, [client._account]
+            yield "projects", None, client.get_projects(payload={"status": "ALL"})
+
+            for kind, path, params, key in [
+                    ("tasks", "tasks.json", client._tasks_payload(), "todo-items"),
+                    ("time_entries", "time_entries.json", {}, "time-entries")]:
+                for page in client._get_pages(path, dict(params, **changed), key):
+                    for project_id, records in itertools.groupby(
+                            page, key=lambda record: normalize_id(record.get("project-id"))):
+                        yield kind, project_id, list(records)
+
+            yield "tags", None, client.get("tags.json").get("tags") or []
+
+            boards = client.get("portfolio/boards.json").get("boards") or []
+            yield "boards", None, boards
+            for board in boards:
+                columns = client.get("/portfolio/boards/%s/columns.json"
+                                     % board.get("id")).get("columns") or []
+                yield "columns", board.get("id"), columns
+                for column in columns:
+                    yield "cards", column.get("id"), client.get(
+                        "/portfolio/columns/%s/cards.json"
+                        % column.get("id")).get("cards") or []
+        finally:
+            client.store = store
+            client.cache = cache
+
+    def answer(self, path, params=None):
+        """Return the ``(json, headers)`` the API would for a GET request"""
+        path = (path or "").lstrip("/")
+        params = params or {}
+        for pattern, handler in self.ROUTES:
+            match = re.match(pattern, path)
+            if match:
+                result = getattr(self, handler)(params, **match.groupdict())
+                return result, {"X-Page": "1", "X-Pages": "1"}
+        raise LookupError("No local data for %s" % path)
+
+    def _answer_account(self, params):
+        accounts = self.records("account")
+        return {"account": accounts[0] if accounts else {}}
+
+    def _answer_tasks(self, params):
+        # Everything is returned on the first page
+        if int(params.get("page", 1)) > 1:
+            return {"todo-items": []}
+        return {"todo-items": self.records("tasks")}
+
+    def _answer_projects(self, params):
+        projects = self.records("projects")
+        if str(params.get("status", "ACTIVE")).upper() != "ALL":
+            # Like the API, only active projects unless asked for all
+            projects = [project for project in projects
+                        if str(project.get("status", "active")).lower() == "active"]
+        tag_ids = params.get("projectTagIds")
+        if tag_ids:
+            tag_ids = set(str(tag_id) for tag_id in str(tag_ids).split(","))
+            projects = [project for project in projects
+                        if tag_ids & set(str(tag.get("id"))
+                                         for tag in project.get("tags") or [])]
+        return {"projects": projects}
+
+    def _answer_projects_by_id(self, params):
+        project_ids = [normalize_id(project_id)
+                       for project_id in str(params.get("projectIds", "")).split(",")
+                       if project_id]
+        projects = dict((normalize_id(project.get("id")), project)
+                        for project in self.records("projects"))
+        return {"projects": [projects[project_id] for project_id in project_ids
+                             if project_id in projects]}
+
+    def _answer_project_tasks(self, params, project_id):
+        return {"todo-items": self.records("tasks", project_id)}
+
+    def _answer_time_entries(self, params, project_id=None):
+        if int(params.get("page", 1)) > 1:
+            return {"time-entries": []}
+        entries = self.records("time_entries", project_id)
+        if params.get("userId"):
+            entries = [entry for entry in entries
+                       if str(entry.get("person-id")) == str(params["userId"])]
+        if params.get("fromdate"):
+            entries = [entry for entry in entries
+                       if _yyyymmdd(entry.get("date")) >= params["fromdate"]]
+        if params.get("todate"):
+            entries = [entry for entry in entries
+                       if _yyyymmdd(entry.get("date")) <= params["todate"]]
+        return {"time-entries": entries}
+
+    def _answer_boards(self, params):
+        return {"boards": self.records("boards")}
+
+    def _answer_columns(self, params, board_id):
+        return {"columns": self.records("columns", board_id)}
+
+    def _answer_cards(self, params, column_id):
+        return {"cards": self.records("cards", column_id)}
+
+    def _answer_tags(self, params):
+        return {"tags": self.records("tags")}
+
+
+def _yyyymmdd(value):
+    """The YYYYMMDD part of an API date or datetime string"""
+    return (value or "").replace("-", "")[:8]
+
+
+class SyncStore(LocalSource):
+    """
+    Local SQLite mirror of an account's projects, tasks, portfolio boards,
+    columns and cards, tags and time entries.
+
+    The first ``sync()`` pulls everything, later ones only fetch tasks and
+    time entries changed since the previous sync. Projects, boards, columns,
+    cards and tags are small and are always refreshed in full, so deleted
+    projects are dropped together with their tasks and time entries.
+
+    The API doesn't report deleted tasks or time entries through its
+    updated-after filters, so ones deleted inside a project that still exists
+    stay in the store until the next ``sync(full=True)``. Run a full sync
+    periodically (eg. weekly) if that matters for your reports.
+
+        >>> store = SyncStore('teamwork.db')
+        >>> store.sync(tw)
+        >>> tw.store = store
+        >>> tw.get_summary_for_portfolios(['.*'])
+    """
+    TABLES = LocalSource.KINDS
+
+    # Re-fetch a little before the watermark to allow for clock skew
+    WATERMARK_OVERLAP = timedelta(minutes=5)
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            for table in self.TABLES:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS %s ("
+                    " id TEXT PRIMARY KEY, parent_id TEXT,"
+                    " position INTEGER, data TEXT)" % table)
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS %s_parent ON %s (parent_id, position)"
+                    % (table, table))
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                " name TEXT PRIMARY KEY, value TEXT)")
+
+    def records(self, kind, parent_id=None):
+        assert kind in self.TABLES, "Unknown record type %s" % kind
+        sql = "SELECT data FROM %s" % kind
+        args = ()
+        if parent_id is not None:
+            sql += " WHERE parent_id = ?"
+            args = (normalize_id(parent_id),)
+        sql += " ORDER BY position, rowid"
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def save(self, kind, records, parent_key=None, parent_id=None, replace=False):
+        """
+        Insert or update records of one kind
+
+        :param: parent_key: Field of each record holding its parent id
+        :param: parent_id: Parent id to use for all the records instead
+        :param: replace: Remove the existing records (of this parent) first
+        """
+        rows = []
+        for position, record in enumerate(records):
+            parent = parent_id
+            if parent_key:
+                parent = record.get(parent_key)
+            rows.append((normalize_id(record.get("id")), normalize_id(parent),
+                         position, json.dumps(record)))
+
+        with self._lock, self._db:
+            if replace and parent_id is not None:
+                self._db.execute("DELETE FROM %s WHERE parent_id = ?" % kind,
+                                 (normalize_id(parent_id),))
+            elif replace:
+                self._db.execute("DELETE FROM %s" % kind)
+            if not replace:
+                # Updated records keep their original position
+                self._db.executemany(
+                    "UPDATE %s SET parent_id = ?, data = ? WHERE id = ?" % kind,
+                    [(parent, data, record_id)
+                     for (record_id, parent, _, data) in rows])
+                offset = self._db.execute(
+                    "SELECT COALESCE(MAX(position), -1) + 1 FROM %s" % kind
+                ).fetchone()[0]
+                rows = [(record_id, parent, offset + position, data)
+                        for (record_id, parent, position, data) in rows]
+            self._db.executemany(
+                "INSERT OR IGNORE INTO %s (id, parent_id, position, data)"
+                " VALUES (?, ?, ?, ?)" % kind, rows)
+
+    def get_state(self, name, default=None):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, name, value):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)",
+                (name, value))
+
+    @property
+    def watermark(self):
+        """UTC time of the last successful sync, as YYYYMMDDHHMMSS"""
+        return self.get_state("watermark")
+
+    def sync(self, client, full=False):
+        """
+        Pull changes from the API into the store
+
+        :param: client: Teamwork client to fetch with. Its own ``store`` and
+            ``cache`` are bypassed while syncing
+        :param: full: Refetch everything instead of changes since the last sync
+        :returns: Number of records fetched per record type
+        :rtype: dict
+        """
+        started = datetime.now(timezone.utc)
+        since = None if full else self.watermark
+        counts = dict((kind, 0) for kind in self.KINDS if kind != "account")
+
+        if not since:
+            self.save("tasks", [], replace=True)
+            self.save("time_entries", [], replace=True)
+        self.save("columns", [], replace=True)
+        self.save("cards", [], replace=True)
+        project_ids = []
+        for kind, parent_id, records in self.pull(client, since):
+            if parent_id is None:
+                # Small record types are always refreshed in full
+                self.save(kind, records, replace=True)
+            else:
+                self.save(kind, records, parent_id=parent_id)
+            if kind == "projects":
+                project_ids = [project.get("id") for project in records]
+            if kind in counts:
+                counts[kind] += len(records)
+        self._drop_orphans(project_ids)
+
+        watermark = started - self.WATERMARK_OVERLAP
+        self.set_state("watermark", watermark.strftime("%Y%m%d%H%M%S"))
+        return counts
+
+    def _drop_orphans(self, project_ids):
+        """Remove tasks and time entries of projects that no longer exist"""
+        keep = set(normalize_id(project_id) for project_id in project_ids)
+        with self._lock, self._db:
+            for kind in ["tasks", "time_entries"]:
+                parents = [parent for (parent,) in self._db.execute(
+                    "SELECT DISTINCT parent_id FROM %s" % kind)]
+                self._db.executemany(
+                    "DELETE FROM %s WHERE parent_id = ?" % kind,
+                    [(parent,) for parent in parents if parent not in keep])
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,182 @@
+"""
+Partial summaries of a project's tasks.
+
+A partial is computed from one project's tasks alone, so partials can be
+built concurrently (or cached) and folded into a board/tag summary later.
+Folding partials in project order gives exactly the same summary as walking
+every task of every project in that order.
+
+Each project's tasks are read once, in one pass over the API dicts, into
+``TaskColumns``. Partials for any day are then computed from those without
+looking at the tasks again.
+"""
+import bisect
+
+
+def today_yyyymmdd():
+    import arrow
+    now = arrow.now()
+    return int("%04d%02d%02d" % (now.year, now.month, now.day))
+
+
+def new_summary():
+    return {
+        "start-date": None,
+        "due-date": None,
+        "progress": 0,
+        "progress-percent": 0,
+        "estimated-minutes": 0,       # from estimated-minutes
+        "tasks": 0,
+        "completed": 0,     # based on status=deleted, completed, reopened, new
+        "completed-percent": 0,
+        "active": 0,        # based on status=deleted, completed, reopened, new
+        "late": 0,          # calculated
+        "projects": []
+    }
+
+
+class TaskColumns(object):
+    """
+    What the summaries use of a project's tasks, read in one pass
+
+    ``running_due`` holds, for each task in API order, the latest due date of
+    the tasks up to it as a YYYYMMDD string ("" while none is set). It never
+    decreases, so the late tasks of any day are counted by bisection. The
+    other fields are totals over the tasks.
+    """
+    __slots__ = ("running_due", "start", "progress", "minutes", "completed")
+
+    def __init__(self, tasks):
+        running_due = []
+        append = running_due.append
+        latest = start = ""
+        progress = minutes = completed = 0
+        for task in tasks:
+            get = task.get
+            due = get("due-date")
+            if due and due > latest:
+                latest = due
+            append(latest)
+            task_start = get("start-date")
+            if task_start and (not start or task_start < start):
+                start = task_start
+            task_progress = get("progress") or 0
+            progress += int(task_progress)
+            minutes += int(get("estimated-minutes") or 0)
+            if (get("completed") or task_progress == 100
+                    or (get("status") or "").startswith("complete")):
+                completed += 1
+        self.running_due = running_due
+        self.start = start
+        self.progress = progress
+        self.minutes = minutes
+        self.completed = completed
+
+    def __len__(self):
+        return len(self.running_due)
+
+    def totals(self):
+        """The partial summary fields that don't depend on the day"""
+        return {
+            "tasks": len(self),
+            "start-date": self.start or None,
+            "due-date": self.running_due[-1] or None if self.running_due else None,
+            "progress": self.progress,
+            "estimated-minutes": self.minutes,
+            "completed": self.completed,
+            "active": len(self) - self.completed,
+        }
+
+
+def summarize_tasks(tasks, today):
+    """
+    Partial summary of one project's tasks
+
+    A task counts as late when the latest due date seen so far, including
+    earlier projects of the same summary, is before today. That depends on
+    the projects folded in before this one, so two counts are kept:
+
+    * "late": tasks that are late if no earlier project had a due date
+    * "late-if-overdue": tasks that are late if the earlier projects' latest
+      due date is already past (any task whose running due date is unset or
+      before today)
+
+    :param: tasks: Task dicts of one project in API order, or TaskColumns
+    :param: today: Today as a YYYYMMDD int
+    :returns: Partial summary dict
+    """
+    columns = tasks if isinstance(tasks, TaskColumns) else TaskColumns(tasks)
+    partial = columns.totals()
+    late_if_overdue = bisect.bisect_left(columns.running_due, "%08d" % today)
+    partial["late"] = late_if_overdue - bisect.bisect_right(columns.running_due, "")
+    partial["late-if-overdue"] = late_if_overdue
+    return partial
+
+
+def partial_state(tasks):
+    """
+    A project's partial summary in a form that doesn't depend on the day
+
+    Same fields as ``summarize_tasks()`` without the late counts, plus
+    "running-due": the running due dates of the tasks as YYYYMMDD ints (0 for
+    unset), which ``partial_for_day()`` counts the late tasks of any day
+    from. Suitable for storing as JSON.
+
+    :param: tasks: Task dicts of one project in API order, or TaskColumns
+    """
+    columns = tasks if isinstance(tasks, TaskColumns) else TaskColumns(tasks)
+    partial = columns.totals()
+    partial["running-due"] = [int(due) if due else 0 for due in columns.running_due]
+    return partial
+
+
+def partial_for_day(state, today):
+    """The ``summarize_tasks()`` partial for today of a ``partial_state()``"""
+    running_due = state["running-due"]
+    partial = dict((field, value) for field, value in state.items()
+                   if field != "running-due")
+    late_if_overdue = bisect.bisect_left(running_due, today)
+    partial["late"] = late_if_overdue - bisect.bisect_right(running_due, 0)
+    partial["late-if-overdue"] = late_if_overdue
+    return partial
+
+
+def merge_partial(summary, partial, today):
+    """Fold a project's partial summary into a running summary"""
+    # No need to process empty projects
+    if not partial["tasks"]:
+        return
+    summary["tasks"] += partial["tasks"]
+
+    due_date = summary["due-date"]
+    if not due_date:
+        summary["late"] += partial["late"]
+    elif int(due_date) < today:
+        summary["late"] += partial["late-if-overdue"]
+    # else the summary is already due today or later, so no task is late
+
+    if partial["start-date"]:
+        if not summary["start-date"] or partial["start-date"] < summary["start-date"]:
+            summary["start-date"] = partial["start-date"]
+    if partial["due-date"]:
+        if not summary["due-date"] or partial["due-date"] > summary["due-date"]:
+            summary["due-date"] = partial["due-date"]
+
+    for field in ["progress", "estimated-minutes", "completed", "active"]:
+        summary[field] += partial[field]
+
+
+def finalize_summary(summary):
+    import arrow
+
+    if summary["tasks"]:
+        summary["progress-percent"] = summary["progress"] / (summary["tasks"] * 100)
+        summary["completed-percent"] = summary["completed"] / (summary["tasks"])
+
+    # Format the datetime fields
+    if summary.get("start-date"):
+        summary["start-date"] = arrow.get(summary.get("start-date"), "YYYYMMDD").date()
+    if summary.get("due-date"):
+        summary["due-date"] = arrow.get(summary.get("due-date"), "YYYYMMDD").date()
+
+    return summary
@@ -1,13 +1,34 @@
-import requests
+import os
+import copy
 import json
 import sys
+import hashlib
+import threading
 import time
-import re
 import logging
-import arrow
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .index import ProjectIndex, normalize_id
+from .memo import RunScope, SingleFlight
+from .catalog import NameCatalog
+from .metrics import Metrics, endpoint_template
+from .records import Task, Project, TimeEntry
+from . import summary
 
 
 # Helper Functions
+_pool_worker = threading.local()
+
+
+def _mark_pool_worker():
+    _pool_worker.active = True
+
+
+def _in_pool_worker():
+    return getattr(_pool_worker, "active", False)
+
+
 def spinning_cursor():
     while True:
         for cursor in '|/-\\':
@@ -31,36 +52,153 @@ class Teamwork(object):
     Basic wrapper to work with the Teamwork API
     Based on Teamwork API: http://developer.teamwork.com/
     """
-    def __init__(self, domain, api_key):
-        self._init_vars(domain, api_key)
+    # Columns written for each task in the csv/gsheet outputs
+    TASK_FIELDS = [
+        "id", "content", "status", "completed", "start-date", "due-date", 
+        "progress", "estimated-minutes", 
+        "creator-firstname", "creator-lastname", "project-id", "project-name", "project-owner", "project-start-date", "project-end-date", 
+        "responsible-party-names",
+        "portfolioBoards"
+    ]
+    # Seconds that the tags and portfolio boards are kept before refetching
+    CATALOG_TTL = 3600
+    # Project ids looked up per /projects/api/v3/projects.json request
+    PROJECT_IDS_PER_REQUEST = 100
+    # Columns written for each board/tag in the csv/gsheet summary outputs
+    SUMMARY_FIELDS = [
+        "id", "name",
+        # The remaining fields come from the _summarize_projects() method
+        "start-date", "due-date", "progress",
+        "progress-percent", "estimated-minutes", "tasks", 
+        "completed", "completed-percent", "active", "late"
+    ]
+
+    def __init__(self, domain, api_key, transport=None, pool_size=10,
+                 max_workers=8, cache=None, lazy=False, auth_cache=None):
+        """
+        :param: domain: Teamwork domain, eg. company.teamwork.com
+        :param: api_key: Teamwork API key
+        :param: transport: Object with a ``request()`` method used for all
+            HTTP calls. Defaults to a pooled ``HttpTransport``
+        :param: pool_size: Connection pool size for the default transport
+        :param: max_workers: Threads used to fetch pages/projects
+            concurrently. Capped at pool_size so threads don't queue for
+            connections
+        :param: cache: Optional ``ResponseCache`` for GET requests
+        :param: lazy: Don't authenticate or open the HTTP session until the
+            first request that needs them
+        :param: auth_cache: Path of a JSON file where the authenticated
+            account is kept, so other processes can skip authenticate.json
+        """
+        self._init_vars(domain, api_key, transport, pool_size, max_workers,
+                        cache, auth_cache)
         self._init_logger()
+        if not lazy:
+            self._account
 
-    def _init_vars(self, domain, api_key):
+    def _init_vars(self, domain, api_key, transport=None, pool_size=10,
+                   max_workers=8, cache=None, auth_cache=None):
         self._domain = domain
         self._api_key = api_key
-        self._account = self.authenticate()
-        self._user = User(self._account.get('userId'))
-        self.tags = None
-        self.portfolio_boards = None
+        self._transport = transport
+        self._pool_size = pool_size
+        self._auth_cache = auth_cache and os.path.expanduser(auth_cache)
+        self._account_data = None
+        self.cache = cache
+        # Optional LocalSource (eg. SyncStore) that answers GETs offline
+        self.store = None
+        # Project task lists/summaries shared by the boards and tags of a run,
+        # see run()
+        self._runs = RunScope()
+        # Optional PartialStore keeping project partial summaries between runs
+        self.partials = None
+        # GETs in flight, shared by concurrent callers asking for the same one
+        self.flights = SingleFlight()
+        # Request counters and latency per endpoint, see Metrics
+        self.metrics = Metrics()
+        # Callables run around every request:
+        #   pre_request(method, path, params)
+        #   post_request(event), event being the dict passed to Metrics.observe
+        self.hooks = {"pre_request": [], "post_request": []}
+        # Tags and portfolio boards, looked up by name for the summaries
+        self.tags = NameCatalog(
+            lambda: self.get("tags.json").get("tags"), ttl=self.CATALOG_TTL)
+        self.portfolio_boards = NameCatalog(
+            lambda: self.get("portfolio/boards.json").get("boards"),
+            ttl=self.CATALOG_TTL)
         self.spinner = spinning_cursor()
         # Should the reports output include projects list?
         self.include_projects_in_summary = False
         self.output_format = "json"
+        # Number of threads used to fetch pages/projects concurrently
+        self.max_workers = max(1, min(max_workers, pool_size))
 
     def _init_logger(self):
         # This can be overridden by the caller
+        self.logger = logging.getLogger()
+        if any(getattr(handler, "_teamwork", False) for handler in self.logger.handlers):
+            # Already set up by an earlier client
+            return
+
         # Console Handler for logger.
         ch = logging.StreamHandler(sys.stderr)
+        ch._teamwork = True
         formatter = logging.Formatter(
             '[%(asctime)s][%(levelname)s][%(filename)s:%(funcName)s] %(message)s')
         ch.setFormatter(formatter)
 
-        self.logger = logging.getLogger()
         self.logger.setLevel(logging.WARNING)
         self.logger.addHandler(ch)
         self.logger.info("Logger initialized")
 
+    @property
+    def transport(self):
+        if self._transport is None:
+            # Created on first use, this is what imports requests
+            from .transport import HttpTransport
+            self._transport = HttpTransport(self._api_key, pool_size=self._pool_size)
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport):
+        self._transport = transport
+
+    @property
+    def _account(self):
+        """The authenticated account, fetched on first use"""
+        if self._account_data is None:
+            self._account_data = self._load_account()
+        return self._account_data
+
+    @property
+    def _user(self):
+        return User(self._account.get('userId'))
+
+    def _load_account(self):
+        key = hashlib.sha256(
+            ("%s:%s" % (self._domain, self._api_key)).encode("utf-8")).hexdigest()
+        accounts = {}
+        if self._auth_cache and os.path.exists(self._auth_cache):
+            with open(self._auth_cache) as f:
+                accounts = json.load(f)
+            if key in accounts:
+                return accounts[key]
+
+        account = self.authenticate()
+        if self._auth_cache:
+            accounts[key] = account
+            tmp_path = "%s.%s.tmp" % (self._auth_cache, os.getpid())
+            with open(tmp_path, "w") as f:
+                json.dump(accounts, f)
+            os.replace(tmp_path, self._auth_cache)
+        return account
+
     def get(self, path=None, params=None):
+        result, headers = self._get(path, params=params)
+        return result
+
+    def _get(self, path=None, params=None):
+        """Same as get(), but returns the (json, headers) of the response"""
         url = self.get_base_url()
         if path:
             url = "%s/%s" % (url, path)
@@ -69,24 +207,56 @@ class Teamwork(object):
         if params:
             payload = params
 
-        resp = requests.get(
-            url, auth=(self._api_key, ''), params=payload)
+        if self.store is not None:
+            return self.store.answer(path, payload)
+
+        # Concurrent identical GETs share one request
+        key = json.dumps(["GET", (path or "").lstrip("/"), payload],
+                         sort_keys=True, default=str)
+        (result, headers), shared = self.flights.do(
+            key, lambda: self._fetch(path, url, payload))
+        if shared:
+            # Callers may modify what they get, eg. _add_project_fields()
+            result = copy.deepcopy(result)
+        return result, headers
+
+    def _fetch(self, path, url, payload):
+        """GET through the cache, returning the (json, headers)"""
+        entry = None
+        request_headers = None
+        if self.cache is not None:
+            entry, fresh = self.cache.lookup(path, payload)
+            if fresh:
+                self._observe("GET", path, 0.0, status=200, cache="hit")
+                return entry["body"], entry["headers"]
+            request_headers = self.cache.validators(entry) or None
+
+        resp = self._request("GET", path, url, params=payload,
+                             headers=request_headers)
+
+        if resp.status_code == 304 and entry is not None:
+            # Not modified since we cached it
+            self.cache.revalidated(path, payload, entry)
+            return entry["body"], entry["headers"]
 
         assert resp.status_code==200, f"[{resp.status_code}][{str(resp)}] Error fetching from URL: {url}"
         
-        return resp.json()
+        result = resp.json()
+        if self.cache is not None:
+            self.cache.store(path, payload, result, resp.headers)
+        return result, resp.headers
 
     def put(self, path=None, data=None):
         url = self.get_base_url()
         if path:
             url = "%s/%s" % (url, path)
 
-        request = requests.put(
-            url, auth=(self._api_key, ''), json={'todo-item': data})
+        request = self._request("PUT", path, url, data={'todo-item': data})
 
         if request.status_code != 200:
             raise RuntimeError("[%s] %s" % (request.status_code, request.reason))
 
+        self._written(path)
         return request.text
 
     def post(self, path=None, data=None):
@@ -94,14 +264,56 @@ class Teamwork(object):
         if path:
             url = "%s/%s" % (url, path)
 
-        request = requests.post(
-            url, auth=(self._api_key, ''), json=data)
+        request = self._request("POST", path, url, data=data)
 
         if request.status_code != 201:
             raise RuntimeError("[%s] %s" % (request.status_code, request.reason))
 
+        self._written(path)
         return request.text
 
+    def _request(self, method, path, url, params=None, data=None, headers=None):
+        """transport.request() with the hooks and metrics around it"""
+        for hook in self.hooks["pre_request"]:
+            hook(method, path, params)
+        bytes_out = len(json.dumps(data)) if data is not None else 0
+        started = time.perf_counter()
+        try:
+            resp = self.transport.request(method, url, params=params, json=data,
+                                          headers=headers)
+        except Exception:
+            self._observe(method, path, time.perf_counter() - started,
+                          bytes_out=bytes_out)
+            raise
+        self._observe(method, path, time.perf_counter() - started,
+                      status=resp.status_code, bytes_in=len(resp.content or b""),
+                      bytes_out=bytes_out, retries=getattr(resp, "retries", 0))
+        return resp
+
+    def _observe(self, method, path, seconds, status=None, bytes_in=0,
+                 bytes_out=0, retries=0, cache=None):
+        event = {
+            "method": method, "path": path, "endpoint": endpoint_template(path),
+            "status": status, "seconds": seconds, "bytes_in": bytes_in,
+            "bytes_out": bytes_out, "retries": retries, "cache": cache,
+        }
+        self.metrics.observe(event)
+        self.logger.debug("%s %s %s %.3fs %sB%s" % (
+            method, path, status if status is not None else "failed", seconds,
+            bytes_in, " (cached)" if cache else ""))
+        for hook in self.hooks["post_request"]:
+            hook(event)
+
+    def _written(self, path):
+        """Drop cached and memoized reads that a successful write may change"""
+        if self.cache is not None:
+            self.cache.invalidate_for_write(path)
+        # Task writes don't say which project they belong to
+        self._runs.invalidate("tasks")
+        self._runs.invalidate("partial")
+        if (path or "").lstrip("/").startswith("projects"):
+            self._runs.invalidate("tag-projects")
+
     def get_base_url(self):
         return 'https://%s' % self._domain
 
@@ -148,6 +360,50 @@ class Teamwork(object):
         :returns: List of time entries
         :rtype: list
         """
+        payload = self._time_entries_payload(user_id, start_date, end_date)
+        return [entry for entries_page in self._get_pages(
+                    "projects/%s/time_entries.json" % project_id, payload,
+                    "time-entries")
+                for entry in entries_page]
+
+    def iter_time_entries(self, project_ids=None, user_id=None,
+                          date_ranges=None, records=False):
+        """
+        Yield the time entries of many projects and date ranges
+
+        Every (project, date range) pair is one paginated query. Up to
+        ``max_workers`` queries are fetched concurrently and their entries are
+        yielded in query order, projects first.
+
+        :param: project_ids: Projects to read, None for the whole account
+        :param: user_id: Only entries of this person
+        :param: date_ranges: List of (start_date, end_date) pairs, either may
+            be None. Defaults to all dates
+        :param: records: Yield ``TimeEntry`` records instead of dicts
+        """
+        paths = ["time_entries.json"]
+        if project_ids is not None:
+            paths = ["projects/%s/time_entries.json" % project_id
+                     for project_id in project_ids]
+        queries = [(path, self._time_entries_payload(user_id, start_date, end_date))
+                   for path in paths
+                   for (start_date, end_date) in date_ranges or [(None, None)]]
+
+        def fetch(query):
+            path, payload = query
+            # One thread per query, the queries themselves run concurrently
+            return [entry for entries_page in self._get_pages(
+                        path, payload, "time-entries", max_workers=1)
+                    for entry in entries_page]
+
+        for query, entries, error in self._map_results(fetch, queries):
+            if error is not None:
+                raise error
+            if records:
+                entries = TimeEntry.from_api_list(entries)
+            yield from entries
+
+    def _time_entries_payload(self, user_id=None, start_date=None, end_date=None):
         payload = {}
         if start_date:
             payload['fromdate'] = start_date.strftime('%Y%m%d')
@@ -155,10 +411,7 @@ class Teamwork(object):
             payload['todate'] = end_date.strftime('%Y%m%d')
         if user_id:
             payload['userId'] = user_id
-
-        result = self.get("/projects/%i/time_entries.json" % project_id,
-                          params=payload)
-        return result.get('time-entries')
+        return payload
 
     def save_project_time_entry(self, project_id, entry_date, duration,
                                 user_id, description, start_time):
@@ -188,6 +441,22 @@ class Teamwork(object):
             data=data)
         return result
 
+    def save_project_time_entries(self, entries):
+        """
+        Create many time entries, up to ``max_workers`` at a time
+
+        :param: entries: Iterable of dicts with the arguments of
+            ``save_project_time_entry()`` (project_id, entry_date, duration,
+            user_id, description, start_time). It is read as the entries are
+            sent, so it can be a generator
+        :returns: One dict per entry, in input order, with the ``entry``, the
+            API's ``result`` and the ``error`` raised (None on success)
+        :rtype: list
+        """
+        return [{"entry": entry, "result": result, "error": error}
+                for entry, result, error in self._map_results(
+                    lambda entry: self.save_project_time_entry(**entry), entries)]
+
     def get_time_entry(self, time_id):
         result = self.get('time_entries/%i.json' % time_id)
         return result.get('time-entry')
@@ -208,7 +477,7 @@ class Teamwork(object):
         self.put('/projects/%i.json' % project_id, 
                  data={"project": { "projectOwnerId": owner_id}})
 
-    def get_tasks(self, include_portfolios=False):
+    def get_tasks(self, include_portfolios=False, records=False):
         """Get all tasks across all projects
 
         Parameters
@@ -216,6 +485,9 @@ class Teamwork(object):
         include_portfolios : bool, optional
             whether to add the portfolio association into the projects, as a list. 
             By default False.
+        records : bool, optional
+            return compact ``Task`` records instead of the API's dicts (json
+            output format only). By default False.
 
         Returns
         -------
@@ -223,78 +495,66 @@ class Teamwork(object):
             Returns JSON object of all the tasks
             
         """
-        tasks = []
-        page = 0
-        while True:
-            page += 1
-            # We want to keep looping until there are no more tasks, since
-            # the tasks api returns 250 at a time paginated 
-            payload = {
-                "includeCompletedTasks": True,
-                "includeCompletedSubtasks": True,
-                "getSubTasks": "no",
-                "page": page, "pageSize": 250
-            }
-            result = self.get('tasks.json', params=payload)
-            tasks_page = result.get("todo-items")
-            if not tasks_page or len(tasks_page) == 0:
-                # No more tasks to fetch
-                break
-            tasks.extend(tasks_page)
-
-        if include_portfolios:
-            projects = self.get_projects(payload={"include": ["portfolioBoards"]})
-        
-            for task in tasks:
-                # Get the project for this task and add in the portfolioBaords
-                # TODO: Why the F is project.id a str and task.project-id an int?! 
-                # TODO: Notify Teamwork of this inconsistency
-                project = next((project for project in projects 
-                                if project.get("id") == str(task.get("project-id"))), None)
-                task["portfolioBoards"] = project.get("portfolioBoards")
-                task["project-start-date"] = project.get("startDate")
-                task["project-status"] = project.get("startDate")
-                task["project-end-date"] = project.get("endDate")
-                task["project-owner"] = project.get("owner")
-
         if self.output_format == "json":
-            return tasks
+            return list(self.iter_tasks(include_portfolios, records))
         
         elif self.output_format in ["gsheet", "csv"]:
-            headers = [
-                "id", "content", "status", "completed", "start-date", "due-date", 
-                "progress", "estimated-minutes", 
-                "creator-firstname", "creator-lastname", "project-id", "project-name", "project-owner", "project-start-date", "project-end-date", 
-                "responsible-party-names",
-                "portfolioBoards"
-            ]
-            csv_out = []
-            csv_out.append(headers)
-            for task in tasks:
-                row = []
-                for header in headers:
-                    if header == "portfolioBoards":
-                        cell = ",".join([pboard.get("board").get("name") for pboard in task.get(header)])
-                    elif header == "project-owner":
-                        if task.get(header):
-                            cell = task.get(header, {}).get("fullName")
-                    else:
-                        cell = task.get(header)
-                    row.append(cell)
-                csv_out.append(row)
-            
-            return csv_out
+            return list(self.iter_task_rows(include_portfolios))
 
-    def get_portfolios():
-        payload = {
-            "includeCompletedTasks": True,
-            "includeCompletedSubtasks": True,
-            "getSubTasks": "no",
-        }
-        result = self.get("portfolio/boards.json")
-        portfolio_boards = result.get("boards", params=payload)
-        
-        return portfolio_boards
+    def iter_tasks(self, include_portfolios=False, records=False):
+        """Yield all tasks across all projects as each page arrives
+
+        Only a few pages of tasks are held in memory at a time, so this is the
+        one to use for large accounts.
+
+        Parameters
+        ----------
+        include_portfolios : bool, optional
+            whether to add the portfolio association into the projects, as a list. 
+            By default False.
+        records : bool, optional
+            yield compact ``Task`` records instead of the API's dicts.
+            By default False.
+
+        Yields
+        ------
+        dict or Task
+            JSON object of each task
+        """
+        projects = None
+        if include_portfolios:
+            projects = ProjectIndex(
+                self.get_projects(payload={"include": ["portfolioBoards"]}))
+
+        # The tasks api returns 250 at a time paginated
+        for tasks_page in self._get_pages('tasks.json', self._tasks_payload(), "todo-items"):
+            if records:
+                tasks_page = Task.from_api_list(tasks_page)
+            if projects is not None:
+                self._add_project_fields(tasks_page, projects)
+            yield from tasks_page
+
+    def iter_task_rows(self, include_portfolios=False):
+        """Yield the header row, then one CSV row per task
+
+        Parameters
+        ----------
+        include_portfolios : bool, optional
+            whether to add the portfolio association into the projects, as a list. 
+            By default False.
+
+        Yields
+        ------
+        list
+            TASK_FIELDS first, then the values of those fields for each task
+        """
+        yield self.TASK_FIELDS
+        for task in self.iter_tasks(include_portfolios):
+            yield self._task_row(task)
+
+    def get_portfolios(self):
+        """All portfolio boards, fetched at most once per CATALOG_TTL"""
+        return list(self.portfolio_boards.items())
 
     def get_tasks_for_project(self, project_id):
         assert project_id, "Cannot retrieve tasks for undefined project-id"
@@ -310,10 +570,76 @@ class Teamwork(object):
 
     def update_task(self, task_id, data):
         result = self.put('tasks/%s.json' % task_id, data=data)
+        return result
+
+    def update_task_many(self, updates):
+        """
+        Update many tasks, up to ``max_workers`` at a time
+
+        Updates to the same task are merged in order into one request, later
+        values winning, so each task is written once.
+
+        :param: updates: Iterable of (task_id, data) pairs
+        :returns: One dict per task, in order of first appearance, with the
+            ``task_id``, the merged ``data``, the API's ``result`` and the
+            ``error`` raised (None on success)
+        :rtype: list
+        """
+        merged = collections.OrderedDict()
+        for task_id, data in updates:
+            merged.setdefault(normalize_id(task_id), {}).update(data)
+
+        return [{"task_id": task_id, "data": data, "result": result, "error": error}
+                for (task_id, data), result, error in self._map_results(
+                    lambda update: self.update_task(*update), merged.items())]
 
     def create_project(self, data):
         result = self.post('projects.json', data=data)
 
+    def with_options(self, **attributes):
+        """
+        A client for other report options (eg. output_format) that shares
+        this one's transport, cache, store, memoized run and catalogs, so
+        reports run side by side in threads fetch everything once
+
+            >>> csv_client = tw.with_options(output_format="csv")
+        """
+        # Created now, so the copies share one connection pool and rate limit
+        self.transport
+        client = copy.copy(self)
+        for name, value in attributes.items():
+            assert hasattr(self, name), "Unknown client option %s" % name
+            setattr(client, name, value)
+        return client
+
+    def run(self):
+        """
+        Context for a report run. The reports made inside it (also from
+        with_options() copies and other threads) fetch each project's tasks
+        and compute its partial summary once, however many boards or tags
+        include it. Outside a run every report starts afresh.
+
+            >>> with tw.run():
+            ...     boards = tw.get_summary_for_portfolios(['.*'])
+            ...     tags = tw.get_summary_for_tags(['tech'])
+        """
+        return self._runs.run()
+
+    def reset_run(self):
+        """
+        Forget the project task lists, summaries and tag lookups memoized by
+        the run in progress
+        """
+        self._runs.invalidate()
+
+    def invalidate_project(self, project_id):
+        """Refetch one project's tasks the next time a summary needs them"""
+        project_id = normalize_id(project_id)
+        self._runs.invalidate("tasks", project_id)
+        self._runs.invalidate("partial", project_id)
+        if self.partials is not None:
+            self.partials.invalidate(project_id)
+
     def get_summary_for_tags(self, tag_names=[]):
         """
         Get summary of tasks, progress, and estimates by tag value
@@ -327,20 +653,14 @@ class Teamwork(object):
 
         tags = self._tags_by_name(tag_names) 
         tag_summaries = []
+        memo = self._runs.current()
 
-        sys.stderr.write("\033[K") # Clear to the end of line
-        self.logger.info("Summarizing %s tags\r" % (len(tags)), end="", file=sys.stderr)
+        self.logger.info("Summarizing %s tags" % (len(tags)))
 
-        for tag in tags:
-            tag_summary = {}
-            tag_summary["name"] = tag.get("name")
-            tag_summary["name"] = tag.get("id")
-            projects = self.get_projects(
-                payload={"projectTagIds" : ",".join([tag.get("id") for tag in tags])}
-            )
-            projects_summary = self._summarize_projects(projects)
-            tag_summary["summary"] = projects_summary
-            tag_summaries.append(tag_summary)
+        tag_projects = self._map(lambda tag: self._tagged_projects(tag, memo), tags)
+        projects_summaries = self._summarize_many(tag_projects, memo)
+        for tag, projects_summary in zip(tags, projects_summaries):
+            tag_summaries.append(self._tag_summary(tag, projects_summary))
 
         return tag_summaries
     
@@ -356,111 +676,373 @@ class Teamwork(object):
         self.logger.info("Summarizing %s Portfolio Boards\r" % (len(boards)))
 
         board_summaries = []
-        summary_fields = [
-            "id", "name",
-            # The remaining fields come from the _summarize_projects() method
-            "start-date", "due-date", "progress",
-            "progress-percent", "estimated-minutes", "tasks", 
-            "completed", "completed-percent", "active", "late"
-        ]
-
         if self.output_format in ["gsheet", "csv"]:
             # Add the header row
-            board_summaries.append(summary_fields) 
+            board_summaries.append(self.SUMMARY_FIELDS) 
             
-        for board in boards:
-            projects = self._projects_in_portfolio_board(board.get("id")) 
-            projects_summary = self._summarize_projects(projects)
-
-            if self.output_format == "json":
-                board_summary = {}
-                board_summary["name"] = board.get("name")
-                board_summary["id"] = board.get("id")
-                board_summary["summary"] = projects_summary
-                board_summaries.append(board_summary)
-            elif self.output_format in  ["csv", "gsheet"]:
-                projects_values = [projects_summary.get(fieldname) for fieldname in summary_fields[2:]]
-                projects_values = [board.get("id"), board.get("name")] + projects_values
-                board_summaries.append(projects_values) 
+        board_projects = self._projects_in_portfolio_boards(
+            [board.get("id") for board in boards])
+        projects_summaries = self._summarize_many(board_projects,
+                                                  self._runs.current())
+        for board, projects_summary in zip(boards, projects_summaries):
+            board_summaries.append(self._board_summary(board, projects_summary))
 
         return board_summaries
 
+    def iter_summary_for_tags(self, tag_names=[], ordered=True):
+        """
+        Yield the summary of each tag as soon as it is ready
+
+        Tags are summarized concurrently. See ``get_summary_for_tags``, which
+        returns the same summaries all at once.
+
+        :param tags: list of tag names
+        :param ordered: yield in tag order, else in order of completion
+        """
+        tags = self._tags_by_name(tag_names)
+        memo = self._runs.current()
+        self.logger.info("Summarizing %s tags" % (len(tags)))
+
+        def summarize(tag):
+            return self._tag_summary(tag, self._summarize_projects(
+                self._tagged_projects(tag, memo), memo))
+
+        yield from self._iter_map(summarize, tags, ordered)
+
+    def iter_summary_for_portfolios(self, portfolios, ordered=True):
+        """
+        Yield the summary of each portfolio board as soon as it is ready
+
+        Boards are summarized concurrently. For csv/gsheet the header row
+        comes first. See ``get_summary_for_portfolios``, which returns the
+        same summaries all at once with fewer project lookups.
+
+        :param portfolio_name: Either full or regex name of the portfolio
+        :param ordered: yield in board order, else in order of completion
+        """
+        boards = self._portfolios_by_name(portfolios)
+        memo = self._runs.current()
+        self.logger.info("Summarizing %s Portfolio Boards\r" % (len(boards)))
+
+        if self.output_format in ["gsheet", "csv"]:
+            yield self.SUMMARY_FIELDS
+
+        def summarize(board):
+            projects = self._projects_in_portfolio_board(board.get("id"))
+            return self._board_summary(board, self._summarize_projects(projects, memo))
+
+        yield from self._iter_map(summarize, boards, ordered)
+
     #--------------------------------------------
     # Internal / Private methods
     #--------------------------------------------
+    def _tasks_payload(self):
+        return {
+            "includeCompletedTasks": True,
+            "includeCompletedSubtasks": True,
+            "getSubTasks": "no",
+            "pageSize": 250
+        }
+
+    def _get_pages(self, path, params, key, max_workers=None):
+        """
+        Yield the ``key`` items of every page of a paginated endpoint, in page
+        order.
+
+        The first page is fetched on its own to read the X-Pages header, then
+        the remaining pages are fetched by up to ``max_workers`` threads
+        (default ``self.max_workers``). At most ``max_workers`` pages are held
+        ahead of the caller. Endpoints that don't send X-Pages are walked one
+        page at a time until an empty page comes back.
+        """
+        max_workers = max_workers or self.max_workers
+        page = 1
+        result, headers = self._get(path, params=dict(params, page=page))
+        items = result.get(key)
+        if not items:
+            return
+        yield items
+
+        if headers.get("X-Pages") is None:
+            while True:
+                page += 1
+                items = self.get(path, params=dict(params, page=page)).get(key)
+                if not items:
+                    # No more items to fetch
+                    return
+                yield items
+
+        pages = int(headers.get("X-Pages"))
+        if max_workers < 2:
+            for page in range(2, pages + 1):
+                yield self.get(path, params=dict(params, page=page)).get(key) or []
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = collections.deque()
+            for page in range(2, pages + 1):
+                pending.append(
+                    executor.submit(self.get, path, dict(params, page=page)))
+                if len(pending) >= max_workers:
+                    yield pending.popleft().result().get(key) or []
+            while pending:
+                yield pending.popleft().result().get(key) or []
+
+    def _add_project_fields(self, tasks, projects):
+        """Copy the portfolio and project details onto each task
+
+        :param: projects: ProjectIndex of the tasks' projects
+        """
+        for task in tasks:
+            # Get the project for this task and add in the portfolioBaords
+            project = projects.for_task(task, {})
+            task["portfolioBoards"] = project.get("portfolioBoards")
+            task["project-start-date"] = project.get("startDate")
+            task["project-status"] = project.get("status")
+            task["project-end-date"] = project.get("endDate")
+            task["project-owner"] = project.get("owner")
+
+    def _tasks_to_rows(self, tasks):
+        """Flatten tasks into CSV rows, with the header row first"""
+        return [self.TASK_FIELDS] + [self._task_row(task) for task in tasks]
+
+    def _task_row(self, task):
+        row = []
+        for header in self.TASK_FIELDS:
+            if header == "portfolioBoards":
+                cell = ",".join([pboard.get("board").get("name") for pboard in task.get(header) or []])
+            elif header == "project-owner":
+                cell = None
+                if task.get(header):
+                    cell = task.get(header, {}).get("fullName")
+            else:
+                cell = task.get(header)
+            row.append(cell)
+        return row
+
+    def _map(self, func, items):
+        """func() over items on up to max_workers threads, results in order"""
+        items = list(items)
+        if len(items) < 2 or self.max_workers < 2 or _in_pool_worker():
+            # Inside another _map()/_iter_map() job the outer pool already
+            # uses max_workers threads
+            return [func(item) for item in items]
+        with self._executor() as executor:
+            return list(executor.map(func, items))
+
+    def _iter_map(self, func, items, ordered=True):
+        """
+        Yield func() over items, run on up to max_workers threads, each
+        result as soon as it (and with ``ordered`` the ones before it) is done
+        """
+        items = list(items)
+        if not items:
+            return
+        with self._executor() as executor:
+            futures = [executor.submit(func, item) for item in items]
+            if not ordered:
+                futures = as_completed(futures)
+            for future in futures:
+                yield future.result()
+
+    def _executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers,
+                                  initializer=_mark_pool_worker)
+
+    def _map_results(self, func, items):
+        """
+        Yield ``(item, result, error)`` for func() over items on up to
+        max_workers threads, in item order
+
+        An exception raised by func() is returned as the error instead of
+        stopping the other items. Items are read lazily and at most
+        2 * max_workers are in flight.
+        """
+        def call(item):
+            try:
+                return item, func(item), None
+            except Exception as error:
+                return item, None, error
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = collections.deque()
+            for item in items:
+                pending.append(executor.submit(call, item))
+                if len(pending) >= 2 * self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
     def _projects_in_portfolio_board(self, board_id):
+        return self._projects_in_portfolio_boards([board_id])[0]
+
+    def _projects_in_portfolio_boards(self, board_ids):
+        """
+        The projects on each board's cards, one list per board in board_ids
+
+        Columns of all the boards and then cards of all the columns are
+        fetched concurrently. The project ids of every card on every board
+        are then deduplicated and looked up in chunks, so a project that sits
+        on several columns or boards is fetched once. Each column's projects
+        are listed in card order.
+        """
+        board_columns = self._map(self._board_column_ids, board_ids)
+        column_ids = [column_id for column_ids in board_columns
+                      for column_id in column_ids]
+        column_project_ids = dict(zip(column_ids, self._map(
+            self._column_project_ids, column_ids)))
+
+        projects = self._projects_by_ids(
+            [project_id for project_ids in column_project_ids.values()
+             for project_id in project_ids])
+
+        return self._board_projects(board_columns, column_project_ids, projects)
+
+    def _board_projects(self, board_columns, column_project_ids, projects):
+        """Each board's projects, column by column in card order"""
+        return [[projects.get(project_id)
+                 for column_id in column_ids
+                 for project_id in column_project_ids[column_id]
+                 if project_id in projects]
+                for column_ids in board_columns]
+
+    def _board_column_ids(self, board_id):
         result = self.get("/portfolio/boards/%s/columns.json" % board_id)
-        projects = []
-        for column in result.get("columns"):
-            result = self.get("/portfolio/columns/%s/cards.json" % column.get("id"))
-            # The cards are not true projects, so let's just send the project-id from them
-            project_ids = [card.get("projectId") for card in result.get("cards")]
-            if not project_ids:
-                # Don't process blank project-id's since otherwise
-                # the projects list below will fetch all projects
-                continue
-
-            # Fetch the projects 
-            result = self.get("/projects/api/v3/projects.json", 
-                              params={"projectIds": ",".join(project_ids)})
-            projects.extend(
-                [{
-                    "id": item.get("id"),
-                    "name": item.get("name"),
-                    "endDate": item.get("endDate"),
-                    "startDate": item.get("startDate"),
-                    "status": item.get("status")
-                 } 
-                 for item in result.get("projects")]
-            )
-        
+        return [column.get("id") for column in result.get("columns")]
+
+    def _column_project_ids(self, column_id):
+        result = self.get("/portfolio/columns/%s/cards.json" % column_id)
+        # The cards are not true projects, so let's just send the project-id from them
+        return [card.get("projectId") for card in result.get("cards")
+                if card.get("projectId")]
+
+    def _projects_by_ids(self, project_ids):
+        """
+        ProjectIndex of the (compact) projects with the given ids
+
+        Ids are deduplicated and fetched PROJECT_IDS_PER_REQUEST at a time,
+        which keeps the URL short and each chunk on a single page.
+        """
+        projects = ProjectIndex()
+        for chunk_projects in self._map(self._fetch_projects_chunk,
+                                        self._project_id_chunks(project_ids)):
+            projects.update(chunk_projects)
         return projects
 
+    def _project_id_chunks(self, project_ids):
+        unique_ids = list(dict.fromkeys(normalize_id(project_id)
+                                        for project_id in project_ids))
+        return [unique_ids[start:start + self.PROJECT_IDS_PER_REQUEST]
+                for start in range(0, len(unique_ids), self.PROJECT_IDS_PER_REQUEST)]
 
-    def _summarize_projects(self, projects):
-        summary = {
-            "start-date": None,
-            "due-date": None,
-            "progress": 0,
-            "progress-percent": 0,
-            "estimated-minutes": 0,       # from estimated-minutes
-            "tasks": 0,
-            "completed": 0,     # based on status=deleted, completed, reopened, new
-            "completed-percent": 0,
-            "active": 0,        # based on status=deleted, completed, reopened, new
-            "late": 0,          # calculated
-            "projects": []
-        }
+    def _fetch_projects_chunk(self, project_ids):
+        projects = []
+        page = 1
+        while True:
+            result = self.get("/projects/api/v3/projects.json", params={
+                "projectIds": ",".join(project_ids),
+                "fields[projects]": ",".join(Project.API_FIELDS),
+                "pageSize": self.PROJECT_IDS_PER_REQUEST,
+                "page": page})
+            projects.extend(
+                [self._compact_project(item) for item in result.get("projects")])
+            if not result.get("meta", {}).get("page", {}).get("hasMore"):
+                return projects
+            page += 1
 
-        for project in projects:
-            self._summarize_project(project, summary)
-            self.logger.warn("Due-date: %s" % summary.get("due-date"))
+    def _summarize_projects(self, projects, memo):
+        return self._summarize_many([projects], memo)[0]
 
-        if summary["tasks"]:
-            summary["progress-percent"] = summary["progress"] / (summary["tasks"] * 100)
-            summary["completed-percent"] = summary["completed"] / (summary["tasks"])
+    def _summarize_many(self, project_lists, memo):
+        """
+        Summaries for several lists of projects (eg. one per board)
 
-        # Format the datetime fields
-        if summary.get("start-date"): 
-            summary["start-date"] = arrow.get(summary.get("start-date"), "YYYYMMDD").date()
-        if summary.get("due-date"): 
-            summary["due-date"] = arrow.get(summary.get("due-date"), "YYYYMMDD").date()
+        Every project's tasks are fetched and reduced to a partial summary
+        concurrently. The partials are then merged in project order, which
+        gives the same result as summarizing one project after another.
 
-        return summary
-    
-    def _summarize_project(self, project, summary):
-        tasks = self.get_tasks_for_project(project.get("id"))
+        :param: memo: RunMemo of the run, see run()
+        """
+        today = summary.today_yyyymmdd()
+        # A run going past midnight doesn't need yesterday's partials
+        memo.retain("partial", lambda key: key[2] == today)
+        projects = [project for project_list in project_lists
+                    for project in project_list]
+        partials = self._map(
+            lambda project: self._project_partial(project, today, memo), projects)
+
+        summaries = []
+        partials = iter(partials)
+        for project_list in project_lists:
+            projects_summary = summary.new_summary()
+            for project in project_list:
+                self._merge_project(projects_summary, project, next(partials), today)
+            summaries.append(summary.finalize_summary(projects_summary))
+        return summaries
+
+    def _project_partial(self, project, today, memo):
+        project_id = normalize_id(project.get("id"))
+        if self.partials is None:
+            return memo.get(
+                ("partial", project_id, today),
+                lambda: summary.summarize_tasks(
+                    self._project_tasks(project_id, memo), today))
+        return memo.get(
+            ("partial", project_id, today),
+            lambda: summary.partial_for_day(self._stored_partial(project, memo), today))
+
+    def _stored_partial(self, project, memo):
+        """The project's partial state from self.partials, computed if stale"""
+        project_id = normalize_id(project.get("id"))
+        stamp = self._project_stamp(project_id, memo)
+        state = self.partials.get(project_id, stamp)
+        if state is None:
+            state = summary.partial_state(self._project_tasks(project_id, memo))
+            self.partials.save(project_id, stamp, state)
+        return state
+
+    def _project_stamp(self, project_id, memo):
+        """
+        When the project or one of its tasks last changed: projects.json's
+        last-changed-on, which moves on task activity too. The v3 projects of
+        the board summaries don't have it, so the stamps of every project are
+        read once per run
+        """
+        stamps = memo.get(("stamps",), lambda: dict(
+            (normalize_id(project.get("id")), project.get("last-changed-on"))
+            for project in self.get_projects({})))
+        return stamps.get(project_id)
+
+    def _project_tasks(self, project_id, memo):
+        """
+        The TaskColumns of get_tasks_for_project(), fetched once per run. The
+        task dicts are dropped once read
+        """
+        project_id = normalize_id(project_id)
+        return memo.get(
+            ("tasks", project_id),
+            lambda: summary.TaskColumns(self.get_tasks_for_project(project_id)))
+
+    def _tagged_projects(self, tag, memo):
+        """The projects with a tag, fetched once per run"""
+        tag_id = str(tag.get("id"))
+        return memo.get(
+            ("tag-projects", tag_id),
+            lambda: self.get_projects(payload={"projectTagIds" : tag_id}))
+
+    def _merge_project(self, projects_summary, project, partial, today):
+        """Fold one project's partial summary into a running summary"""
         # No need to process empty projects
-        if not len(tasks): return
-        summary["tasks"] += len(tasks)
+        if not partial["tasks"]:
+            return
 
-        self.logger.info("Summarizing %s tasks for project %s\r" % (
-                len(tasks), tasks[0].get("project-name"))
+        self.logger.debug("Summarizing %s tasks for project %s" % (
+                partial["tasks"], project.get("name"))
         )
 
         if self.include_projects_in_summary and self.output_format == "json":
             # We don't want the projects details in CSV outputs
-            summary["projects"].append({
+            projects_summary["projects"].append({
                 "name": project.get("name"),
                 "id": project.get("id"),
                 "startDate": project.get("startDate"),
@@ -469,37 +1051,30 @@ class Teamwork(object):
                 "subStatus": project.get("subStatus"),
             })
 
-        today = int("%04d%02d%02d" % (
-                    arrow.now().year, 
-                    arrow.now().month, 
-                    arrow.now().day))
+        summary.merge_partial(projects_summary, partial, today)
 
-        for task in tasks:
-            if task.get("start-date"):
-                if not summary.get("start-date"):
-                    summary["start-date"] = task.get("start-date") 
-                if task.get("start-date") < summary.get("start-date"):
-                    summary["start-date"] = task.get("start-date") 
-
-            if task.get("due-date"):
-                if not summary.get("due-date"):
-                    summary["due-date"] = task.get("due-date")
-                if task.get("due-date") > summary.get("due-date"):
-                    summary["due-date"] = task.get("due-date") 
-                
-            if summary.get("due-date") and int(summary.get("due-date")) < today:
-                summary["late"] += 1
-            if task.get("status").startswith("complete") or task.get("completed") or task.get("progress") == 100:
-                summary["completed"] += 1
-            else:
-                summary["active"] += 1
-                    
-            summary["progress"] += int(task.get("progress", 0))
-            summary["estimated-minutes"] += int(task.get("estimated-minutes", 0))
-
-            if str(summary["due-date"]).startswith("2024"): 
-                breakpoint()
-            self.logger.warn("Due-date: %s" % summary.get("due-date"))
+    def _board_summary(self, board, projects_summary):
+        """Shape a board summary as a dict (json) or a row (csv/gsheet)"""
+        if self.output_format == "json":
+            board_summary = {}
+            board_summary["name"] = board.get("name")
+            board_summary["id"] = board.get("id")
+            board_summary["summary"] = projects_summary
+            return board_summary
+        elif self.output_format in  ["csv", "gsheet"]:
+            projects_values = [projects_summary.get(fieldname) for fieldname in self.SUMMARY_FIELDS[2:]]
+            return [board.get("id"), board.get("name")] + projects_values
+
+    def _tag_summary(self, tag, projects_summary):
+        tag_summary = {}
+        tag_summary["name"] = tag.get("name")
+        tag_summary["id"] = tag.get("id")
+        tag_summary["summary"] = projects_summary
+        return tag_summary
+
+    def _compact_project(self, item):
+        """The subset of a v3 project that the summaries need"""
+        return Project.from_api(item)
 
     def _portfolios_by_name(self, portfolios):
         """
@@ -514,18 +1089,7 @@ class Teamwork(object):
         list of boards
 
         """
-        if not self.portfolio_boards:
-            result = self.get("portfolio/boards.json")
-            portfolio_boards = result.get("boards")
-        
-        self.portfolio_boards = portfolio_boards
-        boards = []
-        if self.portfolio_boards:
-            boards = [item for item in self.portfolio_boards 
-                        for portfolio_name in portfolios 
-                        if re.match(portfolio_name, item.get("name"), re.I)] 
-
-        return boards
+        return self.portfolio_boards.match(portfolios)
 
     def _tags_by_name(self, tagnames):
         """[summary]
@@ -539,15 +1103,4 @@ class Teamwork(object):
         -------
         list of tags with name and id
         """
-        if not self.tags:
-            result = self.get("tags.json")
-            tags = result.get("tags")
-
-        self.tags = tags
-        tagIds = []
-        if self.tags:
-            tagIds = [item for item in self.tags for tag_name in tagnames 
-                        if re.match(tag_name, item["name"], re.I)]
-
-        return tagIds
-
+        return self.tags.match(tagnames)
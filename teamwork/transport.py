@@ -0,0 +1,84 @@
+from .ratelimit import RateLimiter
+
+
+class HttpTransport(object):
+    """
+    Pooled, keep-alive HTTP transport used by the Teamwork client.
+
+    A single ``requests.Session`` is kept for the lifetime of the transport so
+    TCP/TLS connections are reused between calls instead of being set up for
+    every page, column and project that a report walks through.
+
+    Requests pass through a ``RateLimiter`` shared by all threads using the
+    transport, and 429/5xx responses and connection errors are retried with
+    backoff.
+
+    Any object with a compatible ``request()`` method can be passed to
+    ``Teamwork(transport=...)`` instead, eg. for testing or to route calls
+    through a proxy.
+    """
+    def __init__(self, api_key, pool_size=10, timeout=60, rate_limiter=None):
+        """
+        :param: api_key: Teamwork API key, sent as basic-auth username
+        :param: pool_size: Number of connections kept open per host
+        :param: timeout: Seconds to wait for a response before giving up
+        :param: rate_limiter: RateLimiter to use, eg. one shared with other
+            transports for the same account
+        """
+        # Imported here so creating a lazy client doesn't load requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Number of requests that were sent again after a failure
+        self.retries = 0
+        self.session = requests.Session()
+        self.session.auth = (api_key, '')
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, params=None, json=None, headers=None):
+        """
+        Send a request and return the ``requests.Response``
+
+        :param: method: HTTP method, eg. "GET"
+        :param: url: Absolute URL
+        :param: params: Query string parameters
+        :param: json: JSON serializable request body
+        :param: headers: Extra headers for this request only
+        """
+        import requests
+
+        limiter = self.rate_limiter
+        attempt = 0
+        while True:
+            limiter.acquire()
+            try:
+                resp = self.session.request(
+                    method, url, params=params, json=json, headers=headers,
+                    timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if method == "POST" or attempt >= limiter.max_retries:
+                    raise
+                limiter.pause(limiter.retry_delay(attempt))
+            else:
+                limiter.update(resp.headers)
+                if not limiter.should_retry(method, resp.status_code, attempt):
+                    # Times this request was sent again, for the client's metrics
+                    resp.retries = attempt
+                    return resp
+                limiter.pause(limiter.retry_delay(
+                    attempt, resp.headers.get("Retry-After")))
+            attempt += 1
+            self.retries += 1
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,149 @@
+import json
+from urllib.parse import urlparse
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, data=None, headers=None, reason="OK"):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers or {}
+        self._data = data if data is not None else {}
+        self.text = json.dumps(self._data)
+        self.content = self.text.encode("utf-8")
+
+    def json(self):
+        return self._data
+
+
+class FakeTransport(object):
+    """
+    Transport stand-in that serves canned responses by URL path.
+
+    ``routes`` maps a path (without leading slash), or a (method, path)
+    pair, to either a FakeResponse, a dict (returned with status 200) or a
+    callable taking the request params (the body for PUT/POST) and
+    returning one of those.
+    """
+    def __init__(self, routes=None):
+        self.routes = {"authenticate.json": {"account": {"userId": 1}}}
+        self.routes.update(routes or {})
+        self.calls = []
+
+    def request(self, method, url, params=None, json=None, headers=None):
+        path = urlparse(url).path.lstrip("/")
+        self.calls.append((method, path, params, json))
+        route = self.routes.get((method, path), self.routes.get(path))
+        if route is None:
+            return FakeResponse(404, reason="Not Found")
+        if callable(route):
+            route = route(json if method in ("PUT", "POST") else params)
+        if isinstance(route, FakeResponse):
+            return route
+        return FakeResponse(200, route)
+
+    def paths(self, method="GET"):
+        return [path for (verb, path, _, _) in self.calls if verb == method]
+
+
+def make_account(boards=2, projects_per_board=3, tasks_per_project=4,
+                 page_size=250, page_headers=True, entries_per_project=1):
+    """
+    Routes for a small synthetic account: portfolio boards with one column
+    each, one card per project, and tasks with a mix of past and future dates
+    """
+    routes = {}
+    all_projects = []
+    all_tasks = []
+    board_list = []
+    project_id = 100
+    for board_id in range(1, boards + 1):
+        board_list.append({"id": str(board_id), "name": "Board %s" % board_id})
+        column_id = board_id * 10
+        routes["portfolio/boards/%s/columns.json" % board_id] = {
+            "columns": [{"id": str(column_id)}]}
+        cards = []
+        for _ in range(projects_per_board):
+            project_id += 1
+            cards.append({"id": str(project_id * 10), "projectId": str(project_id)})
+            all_projects.append({
+                "id": str(project_id), "name": "Project %s" % project_id,
+                "startDate": "20200101", "endDate": "20301231",
+                "status": "active", "portfolioBoards": [
+                    {"board": {"name": "Board %s" % board_id}}],
+                "owner": {"fullName": "Owner %s" % board_id},
+                "tags": [{"id": "7", "name": "Tech"}],
+                "updatedAt": "2020-01-01T00:00:00Z",
+                "last-changed-on": "2020-01-01T00:00:00Z",
+            })
+            tasks = []
+            for number in range(tasks_per_project):
+                tasks.append({
+                    "id": project_id * 1000 + number,
+                    "content": "Task %s" % number,
+                    "project-id": project_id,
+                    "project-name": "Project %s" % project_id,
+                    "status": "completed" if number % 2 else "new",
+                    "completed": bool(number % 2),
+                    "start-date": "2020%02d01" % (number + 1),
+                    "due-date": "20200301" if number == 0 else "299%d0101" % number,
+                    "progress": 50,
+                    "estimated-minutes": 30,
+                })
+            routes["projects/%s/tasks.json" % project_id] = {"todo-items": tasks}
+            all_tasks.extend(tasks)
+        routes["portfolio/columns/%s/cards.json" % column_id] = {"cards": cards}
+
+    by_id = dict((project["id"], project) for project in all_projects)
+
+    def v3_projects(params):
+        ids = params["projectIds"].split(",")
+        return {"projects": [by_id[project_id] for project_id in ids]}
+
+    def v1_projects(params):
+        tag_id = str((params or {}).get("projectTagIds", ""))
+        return {"projects": [project for project in all_projects
+                             if not tag_id or tag_id in [tag["id"] for tag in project["tags"]]]}
+
+    def paged(items, key, params):
+        page = int((params or {}).get("page", 1))
+        start = (page - 1) * page_size
+        data = {key: items[start:start + page_size]}
+        if not page_headers:
+            return data
+        pages = (len(items) + page_size - 1) // page_size
+        return FakeResponse(200, data, headers={
+            "X-Page": str(page), "X-Pages": str(pages),
+            "X-Records": str(len(items))})
+
+    def tasks_pages(params):
+        return paged(all_tasks, "todo-items", params)
+
+    routes["portfolio/boards.json"] = {"boards": board_list}
+    routes["tags.json"] = {"tags": [{"id": "7", "name": "Tech"}]}
+    routes["projects/api/v3/projects.json"] = v3_projects
+    routes["projects.json"] = v1_projects
+    routes["tasks.json"] = tasks_pages
+    # Entries on the 1st of consecutive months from 2020-01
+    time_entries = [
+        {"id": "%s%d" % (project["id"], number), "project-id": project["id"],
+         "person-id": "1",
+         "date": "%04d-%02d-01T09:00:00Z" % (2020 + number // 12, number % 12 + 1),
+         "hours": "1", "minutes": "30"}
+        for project in all_projects
+        for number in range(entries_per_project)]
+
+    def time_entries_pages(params, project_id=None):
+        entries = [entry for entry in time_entries
+                   if project_id is None or entry["project-id"] == project_id]
+        fromdate = (params or {}).get("fromdate")
+        todate = (params or {}).get("todate")
+        entries = [entry for entry in entries
+                   if (not fromdate or entry["date"][:10].replace("-", "") >= fromdate)
+                   and (not todate or entry["date"][:10].replace("-", "") <= todate)]
+        return paged(entries, "time-entries", params)
+
+    for project in all_projects:
+        routes["projects/%s/time_entries.json" % project["id"]] = \
+            lambda params, project_id=project["id"]: time_entries_pages(params, project_id)
+    routes["time_entries.json"] = time_entries_pages
+    return routes
@@ -0,0 +1,51 @@
+import asyncio
+from unittest import TestCase
+import teamwork
+from tests.fakes import FakeTransport, make_account
+
+
+class TestAsyncTeamwork(TestCase):
+    def setUp(self):
+        self.routes = make_account(page_size=5)
+
+    def client(self):
+        return teamwork.Teamwork("example.teamwork.com", "key",
+                                 transport=FakeTransport(self.routes))
+
+    def test_portfolio_summary_matches_sync(self):
+        for output_format in ["json", "csv"]:
+            tw = self.client()
+            tw.output_format = output_format
+            expected = tw.get_summary_for_portfolios([".*"])
+
+            atw = teamwork.AsyncTeamwork(client=self.client(), concurrency=4)
+            atw.output_format = output_format
+            result = asyncio.run(atw.get_summary_for_portfolios([".*"]))
+            atw.close()
+            self.assertEqual(result, expected)
+
+    def test_get_tasks_matches_sync(self):
+        expected = self.client().get_tasks(include_portfolios=True)
+        atw = teamwork.AsyncTeamwork(client=self.client(), concurrency=3)
+        result = asyncio.run(atw.get_tasks(include_portfolios=True))
+        atw.close()
+        self.assertEqual(len(result), 24)
+        self.assertEqual(result, expected)
+
+    def test_instance_reused_across_event_loops(self):
+        atw = teamwork.AsyncTeamwork(client=self.client(), concurrency=2)
+        first = asyncio.run(atw.get_tasks())
+        second = asyncio.run(atw.get_tasks())
+        atw.close()
+        self.assertEqual(first, second)
+
+    def test_tag_summary_filters_by_its_own_tag(self):
+        self.routes["tags.json"] = {"tags": [{"id": "7", "name": "Tech"},
+                                             {"id": "8", "name": "Tech Ops"}]}
+        atw = teamwork.AsyncTeamwork(client=self.client(), concurrency=2)
+        asyncio.run(atw.get_summary_for_tags(["tech"]))
+        atw.close()
+        tag_filters = sorted(params["projectTagIds"]
+                             for (_, path, params, _) in atw.client.transport.calls
+                             if path == "projects.json")
+        self.assertEqual(tag_filters, ["7", "8"])
@@ -0,0 +1,29 @@
+import argparse
+from unittest import TestCase
+
+from benchmarks.server import Account, MockTeamworkServer
+from benchmarks import run
+
+
+class TestBenchmarks(TestCase):
+    def setUp(self):
+        self.server = MockTeamworkServer(
+            Account(projects=12, tasks_per_project=30, boards=2, tags=3),
+            rate_429=0.1)
+        self.server.start()
+        self.args = argparse.Namespace(workers=4, rate=1000, memory=True)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_scenarios_report_requests_and_memory(self):
+        for name, func in run.SCENARIOS:
+            result = run.run_scenario(self.server.url, func, self.args)
+            self.assertGreater(result["requests"], 0, name)
+            self.assertEqual(result["retries"], result["throttled"], name)
+            self.assertGreater(result["peak_memory"], 0, name)
+
+        # 360 tasks in pages of 250, plus the projects
+        result = run.run_scenario(self.server.url, run.get_tasks, self.args)
+        self.assertEqual(result["by_endpoint"]["tasks.json"], 2)
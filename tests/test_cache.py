@@ -0,0 +1,89 @@
+import os
+import tempfile
+from unittest import TestCase
+import teamwork
+from teamwork import ResponseCache, DiskBackend
+from tests.fakes import FakeTransport, FakeResponse
+
+
+class TestResponseCache(TestCase):
+    def client(self, cache, routes):
+        self.transport = FakeTransport(routes)
+        return teamwork.Teamwork("example.teamwork.com", "key",
+                                 transport=self.transport, cache=cache)
+
+    def test_fresh_entries_skip_the_request(self):
+        tw = self.client(ResponseCache(), {"tags.json": {"tags": [{"id": "1"}]}})
+        tw.get("tags.json")["tags"].append("modified by caller")
+        self.assertEqual(tw.get("tags.json"), {"tags": [{"id": "1"}]})
+        self.assertEqual(self.transport.paths().count("tags.json"), 1)
+
+    def test_stale_entries_revalidate(self):
+        def tags(params):
+            return FakeResponse(200, {"tags": []}, headers={"ETag": '"v1"'})
+        cache = ResponseCache(ttls=[(r"tags\.json", 0)])
+        tw = self.client(cache, {"tags.json": tags})
+        tw.get("tags.json")
+
+        self.transport.routes["tags.json"] = FakeResponse(304)
+        self.assertEqual(tw.get("tags.json"), {"tags": []})
+        self.assertEqual(cache.revalidations, 1)
+
+    def test_lru_bound(self):
+        cache = ResponseCache(max_entries=2)
+        for name in ["a", "b", "c"]:
+            cache.store("projects.json", {"page": name}, {}, {})
+        self.assertIsNone(cache.lookup("projects.json", {"page": "a"})[0])
+        self.assertIsNotNone(cache.lookup("projects.json", {"page": "c"})[0])
+
+    def test_disk_backend_survives_instances(self):
+        directory = tempfile.mkdtemp()
+        ResponseCache(backend=DiskBackend(directory)).store(
+            "tags.json", None, {"tags": ["x"]}, {"X-Pages": "1"})
+        entry, fresh = ResponseCache(backend=DiskBackend(directory)).lookup(
+            "tags.json", None)
+        self.assertTrue(fresh)
+        self.assertEqual(entry["body"], {"tags": ["x"]})
+        self.assertEqual(entry["headers"], {"X-Pages": "1"})
+
+    def test_writes_invalidate_affected_responses(self):
+        tw = self.client(ResponseCache(), {
+            "projects/5/tasks.json": {"todo-items": []},
+            "tags.json": {"tags": []},
+            "tasks/9.json": FakeResponse(200, {}),
+        })
+        tw.get_tasks_for_project(5)
+        tw.get("tags.json")
+        tw.update_task(9, {"due-date": "20210315"})
+        tw.get_tasks_for_project(5)
+        tw.get("tags.json")
+        self.assertEqual(self.transport.paths().count("projects/5/tasks.json"), 2)
+        self.assertEqual(self.transport.paths().count("tags.json"), 1)
+
+    def test_paginated_tasks_not_cached(self):
+        cache = ResponseCache()
+        cache.store("tasks.json", {"page": 1}, {"todo-items": []}, {})
+        self.assertIsNone(cache.lookup("tasks.json", {"page": 1})[0])
+
+    def test_disk_backend_prunes_in_batches(self):
+        backend = DiskBackend(tempfile.mkdtemp(), max_entries=10)
+        for number in range(11):
+            backend.set("key %s" % number, {"number": number})
+        self.assertEqual(backend._count, 9)
+        self.assertEqual(len(os.listdir(backend.directory)), 9)
+
+    def test_disk_read_survives_concurrent_prune(self):
+        backend = DiskBackend(tempfile.mkdtemp())
+        backend.set("key", {"number": 1})
+        utime = os.utime
+
+        def pruned(path, times):
+            # Another process prunes the file between the read and the touch
+            os.remove(path)
+            utime(path, times)
+
+        os.utime = pruned
+        try:
+            self.assertEqual(backend.get("key"), {"number": 1})
+        finally:
+            os.utime = utime
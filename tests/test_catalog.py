@@ -0,0 +1,55 @@
+import re
+from unittest import TestCase
+
+import teamwork
+from teamwork import NameCatalog
+from tests.fakes import FakeTransport, make_account
+
+
+NAMES = ["Client A", "Client B", "client-c", "Internal", "Ops", "Board 10"]
+
+
+class TestNameCatalog(TestCase):
+    def setUp(self):
+        self.fetches = 0
+        self.now = 0.0
+
+        def fetch():
+            self.fetches += 1
+            return [{"id": str(number), "name": name}
+                    for number, name in enumerate(NAMES)]
+
+        self.catalog = NameCatalog(fetch, ttl=60, clock=lambda: self.now)
+
+    def test_match_is_one_pass_of_re_match(self):
+        for patterns in [["client"], ["board 1", "ops"], [".*"], ["(?i)int"],
+                         ["Client .", "client"], []]:
+            expected = [item for item in self.catalog.items()
+                        if any(re.match(pattern, item["name"], re.I)
+                               for pattern in patterns)]
+            self.assertEqual(self.catalog.match(patterns), expected)
+
+    def test_exact_names_ignore_case(self):
+        self.assertEqual([item["id"] for item in self.catalog.get("internal")], ["3"])
+        self.assertEqual(self.catalog.get("intern"), [])
+
+    def test_fetched_again_after_ttl(self):
+        self.catalog.match(["ops"])
+        self.catalog.match(["client"])
+        self.assertEqual(self.fetches, 1)
+        self.now = 61
+        self.catalog.get("ops")
+        self.assertEqual(self.fetches, 2)
+
+
+class TestClientCatalogs(TestCase):
+    def test_boards_and_tags_fetched_once(self):
+        transport = FakeTransport(make_account())
+        tw = teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+        tw.get_summary_for_portfolios(["board 1"])
+        tw.get_summary_for_portfolios(["board 2", "board"])
+        tw.get_summary_for_tags(["tech"])
+        tw.get_summary_for_tags(["TECH"])
+        self.assertEqual(transport.paths().count("portfolio/boards.json"), 1)
+        self.assertEqual(transport.paths().count("tags.json"), 1)
+        self.assertEqual([board["id"] for board in tw.get_portfolios()], ["1", "2"])
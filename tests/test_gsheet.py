@@ -0,0 +1,129 @@
+import datetime
+from unittest import TestCase
+
+import teamwork
+
+
+class FakeHttpError(Exception):
+    """Like googleapiclient's HttpError, with the response in .resp"""
+    def __init__(self, status):
+        super().__init__("HTTP %s" % status)
+        self.resp = type("Response", (), {"status": status})()
+
+
+class FakeSheetsService(object):
+    """
+    Stands in for the Sheets v4 service: keeps the written cells by row and
+    fails the requests listed in failures with the given error
+    """
+    def __init__(self, failures=None):
+        self.rows = {}
+        self.requests = []
+        self.failures = list(failures or [])
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId, body):
+        self._pending = (spreadsheetId, body)
+        return self
+
+    def execute(self):
+        spreadsheet_id, body = self._pending
+        self.requests.append(body)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure is not None:
+                raise failure
+        for data in body["data"]:
+            sheet, cell = data["range"].split("!")
+            row = int(cell.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+            for offset, values in enumerate(data["values"]):
+                self.rows[(sheet, row + offset)] = values
+        return {"totalUpdatedRows": sum(len(data["values"]) for data in body["data"])}
+
+
+def rows(count):
+    for number in range(count):
+        yield [number, "Task %s" % number, None, datetime.date(2021, 1, 1)]
+
+
+class TestSheetWriter(TestCase):
+    def writer(self, service, **options):
+        options.setdefault("chunk_rows", 10)
+        options.setdefault("chunks_per_request", 3)
+        return teamwork.SheetWriter(service, "sheet-id", "TWTasks!A1:Q10000",
+                                    sleep=lambda seconds: None, **options)
+
+    def test_writes_rows_in_chunked_batches(self):
+        service = FakeSheetsService()
+        result = self.writer(service).write(rows(75))
+
+        self.assertEqual(result, {"rows": 75, "next_row": 76})
+        # 30 rows per request in ranges of 10
+        self.assertEqual(len(service.requests), 3)
+        self.assertEqual([data["range"] for data in service.requests[1]["data"]],
+                         ["TWTasks!A31", "TWTasks!A41", "TWTasks!A51"])
+        self.assertEqual(service.requests[2]["data"][-1]["range"], "TWTasks!A71")
+        self.assertEqual(service.requests[0]["valueInputOption"], "USER_ENTERED")
+        self.assertEqual(len(service.rows), 75)
+        self.assertEqual(service.rows[("TWTasks", 75)],
+                         [74, "Task 74", "", "2021-01-01"])
+
+    def test_rows_read_as_they_are_written(self):
+        service = FakeSheetsService()
+        pulled = []
+
+        def generator():
+            for row in rows(40):
+                pulled.append(row)
+                # At most one request's worth of rows is buffered
+                self.assertLessEqual(len(pulled) - len(service.rows), 30)
+                yield row
+
+        self.writer(service).write(generator())
+        self.assertEqual(len(service.rows), 40)
+
+    def test_retries_throttled_requests(self):
+        service = FakeSheetsService(
+            failures=[FakeHttpError(429), ConnectionError("reset"), None])
+        writer = self.writer(service)
+        writer.write(rows(20))
+
+        self.assertEqual(writer.retries, 2)
+        self.assertEqual(len(service.rows), 20)
+
+    def test_resume_after_failure(self):
+        service = FakeSheetsService(failures=[None, FakeHttpError(400)])
+        writer = self.writer(service)
+        with self.assertRaises(teamwork.SheetWriteError) as context:
+            writer.write(rows(75))
+        self.assertEqual(context.exception.next_row, 31)
+        self.assertEqual(len(service.rows), 30)
+
+        progress = []
+        result = writer.write(rows(75), resume_row=context.exception.next_row,
+                              on_progress=progress.append)
+        self.assertEqual(result, {"rows": 45, "next_row": 76})
+        self.assertEqual(progress, [61, 76])
+        self.assertEqual(sorted(row for sheet, row in service.rows),
+                         list(range(1, 76)))
+        self.assertEqual(service.requests[2]["data"][0]["range"], "TWTasks!A31")
+
+    def test_gives_up_after_max_retries(self):
+        service = FakeSheetsService(failures=[FakeHttpError(503)] * 3)
+        with self.assertRaises(teamwork.SheetWriteError) as context:
+            self.writer(service, max_retries=2).write(rows(5))
+        self.assertEqual(context.exception.next_row, 1)
+        self.assertEqual(len(service.requests), 3)
+
+    def test_start_cell(self):
+        service = FakeSheetsService()
+        writer = teamwork.SheetWriter(service, "sheet-id", "Data!C5")
+        writer.write(rows(2))
+        self.assertEqual(service.requests[0]["data"][0]["range"], "Data!C5")
+        with self.assertRaises(ValueError):
+            teamwork.SheetWriter(service, "sheet-id", "A1")
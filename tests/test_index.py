@@ -0,0 +1,11 @@
+from unittest import TestCase
+from teamwork import ProjectIndex
+
+
+class TestProjectIndex(TestCase):
+    def test_str_and_int_ids_match(self):
+        index = ProjectIndex([{"id": "12", "name": "A"}, {"id": 13, "name": "B"}])
+        self.assertEqual(index.for_task({"project-id": 12})["name"], "A")
+        self.assertEqual(index.get("13")["name"], "B")
+        self.assertIn(12, index)
+        self.assertIsNone(index.for_task({"project-id": 99}))
@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+import teamwork
+from teamwork.metrics import endpoint_template
+from tests.fakes import FakeResponse, FakeTransport, make_account
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.transport = FakeTransport(make_account())
+        self.tw = teamwork.Teamwork("example.teamwork.com", "key",
+                                    transport=self.transport)
+
+    def test_endpoint_templates(self):
+        self.assertEqual(endpoint_template("/projects/123/tasks.json"),
+                         "projects/{id}/tasks.json")
+        self.assertEqual(endpoint_template("tasks/5.json"), "tasks/{id}.json")
+        self.assertEqual(endpoint_template("projects/api/v3/projects.json"),
+                         "projects/api/v3/projects.json")
+
+    def test_requests_counted_per_endpoint(self):
+        self.tw.get_summary_for_portfolios([".*"])
+        stats = self.tw.metrics.as_dict()
+        tasks = stats["GET projects/{id}/tasks.json"]
+        self.assertEqual(tasks["requests"], 6)
+        self.assertEqual(tasks["statuses"], {200: 6})
+        self.assertEqual(tasks["latency"]["+Inf"], 6)
+        self.assertGreater(tasks["bytes_in"], 0)
+        self.assertEqual(stats["GET portfolio/columns/{id}/cards.json"]["requests"], 2)
+
+    def test_retries_cache_hits_and_writes(self):
+        throttled = FakeResponse(200, {"tags": []})
+        throttled.retries = 2
+        self.transport.routes["tags.json"] = throttled
+        self.transport.routes[("PUT", "tasks/5.json")] = {}
+        self.tw.cache = teamwork.ResponseCache()
+        self.tw.get("tags.json")
+        self.tw.get("tags.json")
+        self.tw.update_task(5, {"progress": 10})
+
+        stats = self.tw.metrics.as_dict()
+        self.assertEqual(stats["GET tags.json"]["requests"], 1)
+        self.assertEqual(stats["GET tags.json"]["retries"], 2)
+        self.assertEqual(stats["GET tags.json"]["cache_hits"], 1)
+        self.assertGreater(stats["PUT tasks/{id}.json"]["bytes_out"], 0)
+
+        text = self.tw.metrics.to_prometheus()
+        self.assertIn('teamwork_requests_total{method="GET",endpoint="tags.json",status="200"} 1', text)
+        self.assertIn('teamwork_retries_total{method="GET",endpoint="tags.json"} 2', text)
+        self.assertIn('teamwork_request_seconds_bucket{method="PUT",endpoint="tasks/{id}.json",le="+Inf"} 1', text)
+
+    def test_hooks_called_around_requests(self):
+        calls = []
+        self.tw.hooks["pre_request"].append(
+            lambda method, path, params: calls.append(("pre", path)))
+        self.tw.hooks["post_request"].append(
+            lambda event: calls.append(("post", event["endpoint"], event["status"])))
+        self.tw.get("portfolio/boards/1/columns.json")
+        self.assertEqual(calls, [("pre", "portfolio/boards/1/columns.json"),
+                                 ("post", "portfolio/boards/{id}/columns.json", 200)])
@@ -0,0 +1,58 @@
+import sys
+from unittest import TestCase
+
+import teamwork
+from teamwork import Task, Project
+from tests.fakes import FakeTransport, make_account
+
+
+RAW_TASK = dict(
+    [("field-%d" % number, "x" * 40) for number in range(60)],
+    **{"id": 1, "content": "Write docs", "status": "new", "start-date": "20240101",
+       "due-date": "20240201", "progress": 10, "project-id": 101})
+
+
+def resident_size(values):
+    return sum(sys.getsizeof(value) for value in values if value is not None)
+
+
+class TestRecords(TestCase):
+    def test_only_listed_fields_kept(self):
+        task = Task.from_api(RAW_TASK)
+        self.assertFalse(hasattr(task, "__dict__"))
+        self.assertEqual(task.get("due-date"), "20240201")
+        self.assertEqual(task.due_date, "20240201")
+        self.assertEqual(task["project-id"], 101)
+        self.assertIsNone(task.get("field-1"))
+        self.assertEqual(set(task.to_dict()), set(Task.FIELDS))
+        self.assertLess(resident_size(task.to_dict().values()) + sys.getsizeof(task),
+                        (resident_size(RAW_TASK.values()) + sys.getsizeof(RAW_TASK)) / 10)
+
+    def test_project_fields_can_be_set(self):
+        task = Task.from_api(RAW_TASK)
+        task["portfolioBoards"] = [{"board": {"name": "Board"}}]
+        self.assertEqual(task.portfolioBoards[0]["board"]["name"], "Board")
+        with self.assertRaises(KeyError):
+            task["field-1"] = "x"
+
+
+class TestClientRecords(TestCase):
+    def setUp(self):
+        self.transport = FakeTransport(make_account())
+        self.tw = teamwork.Teamwork("example.teamwork.com", "key",
+                                    transport=self.transport)
+
+    def test_task_records_match_dicts(self):
+        tasks = self.tw.get_tasks(include_portfolios=True)
+        records = self.tw.get_tasks(include_portfolios=True, records=True)
+        self.assertTrue(all(isinstance(task, Task) for task in records))
+        self.assertEqual([self.tw._task_row(task) for task in tasks],
+                         [self.tw._task_row(task) for task in records])
+
+    def test_project_fields_requested_from_v3(self):
+        self.tw.get_summary_for_portfolios([".*"])
+        params = [params for (method, path, params, _) in self.transport.calls
+                  if path.endswith("api/v3/projects.json")]
+        self.assertTrue(params)
+        for param in params:
+            self.assertEqual(param["fields[projects]"], ",".join(Project.API_FIELDS))
@@ -0,0 +1,50 @@
+import os
+import gzip
+import tempfile
+from unittest import TestCase
+
+import teamwork
+from teamwork import Snapshot
+from tests.fakes import FakeTransport, make_account
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        self.transport = FakeTransport(make_account(page_size=5))
+        self.tw = teamwork.Teamwork("example.teamwork.com", "key",
+                                    transport=self.transport)
+        self.path = os.path.join(tempfile.mkdtemp(), "account.jsonl.gz")
+
+    def test_reports_from_snapshot_match_api(self):
+        counts = Snapshot(self.path).dump(self.tw)
+        self.assertEqual(counts["tasks"], 24)
+        self.assertEqual(counts["cards"], 6)
+        with gzip.open(self.path, "rt") as f:
+            self.assertEqual(len(f.readlines()), 1 + 6 + 24 + 6 + 1 + 2 + 2 + 6)
+
+        tasks = self.tw.get_tasks(include_portfolios=True)
+        portfolios = self.tw.get_summary_for_portfolios([".*"])
+        tags = self.tw.get_summary_for_tags(["tech"])
+
+        offline = teamwork.Teamwork("example.teamwork.com", "key",
+                                    transport=FakeTransport(), lazy=True)
+        offline.store = Snapshot(self.path)
+        self.assertEqual(offline.get_tasks(include_portfolios=True), tasks)
+        self.assertEqual(offline.get_summary_for_portfolios([".*"]), portfolios)
+        self.assertEqual(offline.get_summary_for_tags(["tech"]), tags)
+        self.assertEqual(offline._account, {"userId": 1})
+        self.assertEqual(offline.transport.calls, [])
+
+    def test_append_and_lost_index(self):
+        snapshot = Snapshot(self.path)
+        snapshot.append("tasks", [{"id": 1, "project-id": 5}], 5)
+        snapshot.append_by("tasks", [{"id": 2, "project-id": 6},
+                                     {"id": 3, "project-id": 5}], "project-id")
+        self.assertEqual([task["id"] for task in snapshot.records("tasks")], [1, 2, 3])
+        self.assertEqual([task["id"] for task in snapshot.records("tasks", 5)], [1, 3])
+
+        os.remove(snapshot.index_path)
+        reopened = Snapshot(self.path)
+        self.assertTrue(os.path.exists(reopened.index_path))
+        self.assertEqual([task["id"] for task in reopened.records("tasks", "5")], [1, 3])
+        self.assertEqual([task["id"] for task in reopened.records("tasks")], [1, 2, 3])
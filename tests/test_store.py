@@ -0,0 +1,62 @@
+from unittest import TestCase
+import teamwork
+from teamwork import SyncStore
+from tests.fakes import FakeTransport, make_account
+
+
+class TestSyncStore(TestCase):
+    def setUp(self):
+        self.transport = FakeTransport(make_account(page_size=5))
+        self.tw = teamwork.Teamwork("example.teamwork.com", "key",
+                                    transport=self.transport)
+        self.store = SyncStore()
+
+    def test_pull_walks_account_in_order(self):
+        cache = self.tw.cache = teamwork.ResponseCache()
+        pulled = list(self.store.pull(self.tw))
+        kinds = [kind for kind, _, _ in pulled]
+        self.assertEqual(sorted(set(kinds), key=kinds.index), SyncStore.KINDS)
+        self.assertTrue(all(parent_id for kind, parent_id, _ in pulled
+                            if kind in ["tasks", "time_entries", "columns", "cards"]))
+        self.assertIs(self.tw.cache, cache)
+
+    def test_reports_from_store_match_api(self):
+        counts = self.store.sync(self.tw)
+        self.assertEqual(counts["tasks"], 24)
+        self.assertEqual(counts["cards"], 6)
+
+        tasks = self.tw.get_tasks(include_portfolios=True)
+        summary = self.tw.get_summary_for_portfolios([".*"])
+        project_times = self.tw.get_project_times(101)
+
+        calls = len(self.transport.calls)
+        self.tw.store = self.store
+        self.assertEqual(self.tw.get_tasks(include_portfolios=True), tasks)
+        self.assertEqual(self.tw.get_summary_for_portfolios([".*"]), summary)
+        self.assertEqual(self.tw.get_project_times(101), project_times)
+        self.assertEqual(len(self.tw.get_tasks_for_project(102)), 4)
+        self.assertEqual(len(self.transport.calls), calls)
+
+    def test_later_syncs_only_fetch_changes(self):
+        self.store.sync(self.tw)
+        self.transport.calls = []
+        self.store.sync(self.tw)
+        tasks_params = [params for (_, path, params, _) in self.transport.calls
+                        if path == "tasks.json"]
+        self.assertTrue(all(params.get("updatedAfterDate") for params in tasks_params))
+        # Changed tasks are upserted, not duplicated
+        self.assertEqual(len(self.store.records("tasks")), 24)
+        self.assertEqual(len(self.store.records("tasks", 101)), 4)
+
+    def test_sync_bypasses_cache_and_drops_deleted_projects(self):
+        self.tw.cache = teamwork.ResponseCache()
+        self.store.sync(self.tw)
+        self.assertIsNotNone(self.tw.cache)
+        self.assertEqual(self.tw.cache.hits + self.tw.cache.misses, 0)
+
+        routes = self.transport.routes
+        projects = routes["projects.json"]({})["projects"]
+        routes["projects.json"] = {"projects": projects[1:]}
+        self.store.sync(self.tw)
+        self.assertEqual(self.store.records("tasks", 101), [])
+        self.assertEqual(len(self.store.records("tasks")), 20)
@@ -0,0 +1,91 @@
+import time
+import random
+from unittest import TestCase
+from teamwork import summary
+
+TODAY = 20240615
+
+
+def reference_summary(project_tasks, today=TODAY):
+    """The original one-task-at-a-time summary loop"""
+    result = summary.new_summary()
+    for tasks in project_tasks:
+        if not len(tasks):
+            continue
+        result["tasks"] += len(tasks)
+        for task in tasks:
+            if task.get("start-date"):
+                if not result.get("start-date"):
+                    result["start-date"] = task.get("start-date")
+                if task.get("start-date") < result.get("start-date"):
+                    result["start-date"] = task.get("start-date")
+            if task.get("due-date"):
+                if not result.get("due-date"):
+                    result["due-date"] = task.get("due-date")
+                if task.get("due-date") > result.get("due-date"):
+                    result["due-date"] = task.get("due-date")
+            if result.get("due-date") and int(result.get("due-date")) < today:
+                result["late"] += 1
+            if task.get("status").startswith("complete") or task.get("completed") or task.get("progress") == 100:
+                result["completed"] += 1
+            else:
+                result["active"] += 1
+            result["progress"] += int(task.get("progress", 0))
+            result["estimated-minutes"] += int(task.get("estimated-minutes", 0))
+    return summary.finalize_summary(result)
+
+
+def random_tasks(rng, count):
+    def date():
+        if rng.random() < 0.3:
+            return ""
+        return "%04d%02d%02d" % (rng.choice([2023, 2024, 2025]),
+                                 rng.randint(1, 12), rng.randint(1, 28))
+    return [{
+        "start-date": date(),
+        "due-date": date(),
+        "status": rng.choice(["new", "completed", "reopened"]),
+        "completed": rng.random() < 0.2,
+        "progress": rng.choice([0, 10, 50, 100]),
+        "estimated-minutes": rng.randint(0, 600),
+    } for _ in range(count)]
+
+
+class TestPartialSummaries(TestCase):
+    def test_merged_partials_match_reference(self):
+        self.check_against_reference()
+
+    def test_faster_than_task_loop(self):
+        tasks = random_tasks(random.Random(3), 50000)
+
+        def best(call):
+            times = []
+            for _ in range(3):
+                started = time.perf_counter()
+                call()
+                times.append(time.perf_counter() - started)
+            return min(times)
+
+        self.assertLess(best(lambda: summary.summarize_tasks(tasks, TODAY)),
+                        best(lambda: reference_summary([tasks])))
+
+    def check_against_reference(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            project_tasks = [random_tasks(rng, rng.randint(0, 8))
+                             for _ in range(rng.randint(0, 5))]
+            merged = summary.new_summary()
+            for tasks in project_tasks:
+                summary.merge_partial(
+                    merged, summary.summarize_tasks(tasks, TODAY), TODAY)
+            self.assertEqual(summary.finalize_summary(merged),
+                             reference_summary(project_tasks))
+
+    def test_stored_state_gives_partial_of_any_day(self):
+        rng = random.Random(11)
+        for _ in range(100):
+            tasks = random_tasks(rng, rng.randint(0, 8))
+            state = summary.partial_state(tasks)
+            for today in [20230101, TODAY, 20260101]:
+                self.assertEqual(summary.partial_for_day(state, today),
+                                 summary.summarize_tasks(tasks, today))
@@ -1,7 +1,16 @@
+import os
+import sys
+import subprocess
+import logging
+import tempfile
+import threading
+import time as time_module
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
-from datetime import timedelta, time
+from datetime import date, timedelta, time
 import teamwork
 import inspect
+from tests.fakes import FakeResponse, FakeTransport, make_account
 
 
 class TestTeamwork(TestCase):
@@ -17,3 +26,318 @@ class TestTeamwork(TestCase):
     def test_time_to_hhmm(self):
         entry_time = teamwork.time_to_hhmm(time(8, 45))
         self.assertEqual(entry_time, '8:45')
+
+
+class TestGetTasks(TestCase):
+    def client(self, page_headers=True, **kwargs):
+        self.transport = FakeTransport(
+            make_account(page_size=5, page_headers=page_headers))
+        return teamwork.Teamwork("example.teamwork.com", "key",
+                                 transport=self.transport, **kwargs)
+
+    def test_pages_fetched_in_order_from_page_count(self):
+        tw = self.client(max_workers=3)
+        tasks = tw.get_tasks()
+        self.assertEqual([task["id"] for task in tasks],
+                         sorted(task["id"] for task in tasks))
+        self.assertEqual(len(tasks), 24)
+        # 24 tasks in pages of 5, and no trailing empty page request
+        self.assertEqual(self.transport.paths().count("tasks.json"), 5)
+
+    def test_max_workers_capped_at_pool_size(self):
+        self.assertEqual(self.client(max_workers=32, pool_size=4).max_workers, 4)
+
+    def test_pages_walked_without_page_count(self):
+        tw = self.client(page_headers=False)
+        self.assertEqual(len(tw.get_tasks()), 24)
+        self.assertEqual(self.transport.paths().count("tasks.json"), 6)
+
+    def test_iter_task_rows_streams_pages(self):
+        tw = self.client()
+        rows = tw.iter_task_rows(include_portfolios=True)
+        self.assertEqual(next(rows), teamwork.Teamwork.TASK_FIELDS)
+        first = next(rows)
+        self.assertEqual(first[0], 101000)
+        self.assertEqual(first[-1], "Board 1")
+        # Only the first page has been requested so far
+        self.assertEqual(self.transport.paths().count("tasks.json"), 1)
+        self.assertEqual(len(list(rows)), 23)
+
+    def test_project_fields_added_to_tasks(self):
+        task = self.client().get_tasks(include_portfolios=True)[0]
+        self.assertEqual(task["project-status"], "active")
+        self.assertEqual(task["project-owner"], {"fullName": "Owner 1"})
+
+
+class TestSummaries(TestCase):
+    def summaries(self, max_workers, output_format):
+        tw = teamwork.Teamwork("example.teamwork.com", "key",
+                               transport=FakeTransport(make_account(boards=3)),
+                               max_workers=max_workers)
+        tw.output_format = output_format
+        tw.include_projects_in_summary = True
+        return tw.get_summary_for_portfolios([".*"])
+
+    def test_parallel_summary_matches_serial(self):
+        for output_format in ["json", "csv"]:
+            self.assertEqual(self.summaries(8, output_format),
+                             self.summaries(1, output_format))
+
+    def test_projects_looked_up_once_across_boards(self):
+        routes = make_account(boards=2)
+        # The first project of board 1 also sits on board 2
+        routes["portfolio/columns/20/cards.json"]["cards"].append(
+            {"id": "x", "projectId": "101"})
+        transport = FakeTransport(routes)
+        tw = teamwork.Teamwork("example.teamwork.com", "key",
+                               transport=transport)
+        summaries = tw.get_summary_for_portfolios([".*"])
+        self.assertEqual(summaries[1]["summary"]["tasks"], 16)
+        lookups = [params["projectIds"] for (_, path, params, _) in transport.calls
+                   if path == "projects/api/v3/projects.json"]
+        self.assertEqual(lookups, ["101,102,103,104,105,106"])
+
+    def test_project_tasks_fetched_once_per_run(self):
+        transport = FakeTransport(make_account())
+        tw = teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+        with tw.run():
+            tw.get_summary_for_portfolios([".*"])
+            tw.get_summary_for_tags(["tech"])
+            tw.get_summary_for_portfolios(["board 1"])
+        task_paths = [path for path in transport.paths()
+                      if path.endswith("/tasks.json")]
+        self.assertEqual(len(task_paths), 6)
+        self.assertEqual(len(set(task_paths)), 6)
+
+        # Outside a run every report fetches afresh
+        tw.get_summary_for_portfolios(["board 1"])
+        self.assertEqual(len([path for path in transport.paths()
+                              if path.endswith("/tasks.json")]), 9)
+
+    def test_reports_outside_a_run_see_changes(self):
+        account = make_account()
+        transport = FakeTransport(account)
+        tw = teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+        before = tw.get_summary_for_portfolios(["board 1"])[0]["summary"]["tasks"]
+        transport.routes["projects/101/tasks.json"] = {"todo-items": []}
+        after = tw.get_summary_for_portfolios(["board 1"])[0]["summary"]["tasks"]
+        self.assertLess(after, before)
+
+    def test_invalidation_discards_pending_value(self):
+        memo = teamwork.RunMemo()
+        computed = []
+
+        def compute():
+            # A write lands while the value is being computed
+            memo.invalidate("tasks", "1")
+            computed.append(1)
+            return "stale"
+
+        self.assertEqual(memo.get(("tasks", "1"), compute), "stale")
+        self.assertEqual(memo.get(("tasks", "1"), lambda: "fresh"), "fresh")
+        self.assertEqual(len(memo), 1)
+
+    def test_other_days_partials_dropped(self):
+        tw = teamwork.Teamwork("example.teamwork.com", "key",
+                               transport=FakeTransport(make_account()))
+        with tw.run() as memo:
+            memo.get(("partial", "101", "20000101"), lambda: {})
+            tw.get_summary_for_portfolios([".*"])
+            self.assertFalse([key for key in memo._values
+                              if key[0] == "partial" and key[2] == "20000101"])
+
+    def test_summary_generators_match_lists(self):
+        for output_format in ["json", "csv"]:
+            tw = teamwork.Teamwork("example.teamwork.com", "key",
+                                   transport=FakeTransport(make_account(boards=3)))
+            tw.output_format = output_format
+            self.assertEqual(list(tw.iter_summary_for_portfolios([".*"])),
+                             tw.get_summary_for_portfolios([".*"]))
+        unordered = list(tw.iter_summary_for_portfolios([".*"], ordered=False))
+        self.assertEqual(unordered[0], tw.SUMMARY_FIELDS)
+        self.assertEqual(sorted(row[0] for row in unordered[1:]), ["1", "2", "3"])
+
+        tw.output_format = "json"
+        self.assertEqual(list(tw.iter_summary_for_tags(["tech"])),
+                         tw.get_summary_for_tags(["tech"]))
+
+    def test_clients_with_options_share_the_run(self):
+        transport = FakeTransport(make_account())
+        tw = teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+        clients = [tw.with_options(output_format=output_format)
+                   for output_format in ["json", "csv"]]
+        with tw.run(), ThreadPoolExecutor(max_workers=2) as executor:
+            json_summary, csv_summary = executor.map(
+                lambda client: client.get_summary_for_portfolios([".*"]), clients)
+        self.assertEqual(tw.output_format, "json")
+        self.assertEqual(csv_summary[0], tw.SUMMARY_FIELDS)
+        self.assertEqual([row[0] for row in csv_summary[1:]],
+                         [board["id"] for board in json_summary])
+        self.assertEqual(len([path for path in transport.paths()
+                              if path.endswith("/tasks.json")]), 6)
+
+
+class TestStoredPartials(TestCase):
+    def test_only_changed_projects_refetched(self):
+        routes = make_account()
+        partials = teamwork.PartialStore()
+
+        def run(partials=partials):
+            transport = FakeTransport(routes)
+            tw = teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+            tw.partials = partials
+            summaries = (tw.get_summary_for_portfolios([".*"]),
+                         tw.get_summary_for_tags(["tech"]))
+            return summaries, [path for path in transport.paths()
+                               if path.endswith("/tasks.json")]
+
+        expected = run(partials=None)[0]
+        summaries, fetched = run()
+        self.assertEqual(summaries, expected)
+        self.assertEqual(len(fetched), 6)
+
+        summaries, fetched = run()
+        self.assertEqual(summaries, expected)
+        self.assertEqual(fetched, [])
+
+        # Task activity moves last-changed-on but not the v3 updatedAt
+        project = routes["projects.json"]({})["projects"][1]
+        project["last-changed-on"] = "2020-02-01T00:00:00Z"
+        summaries, fetched = run()
+        self.assertEqual(summaries, expected)
+        self.assertEqual(fetched, ["projects/102/tasks.json"])
+
+
+class TestTimeEntries(TestCase):
+    def client(self, **kwargs):
+        self.transport = FakeTransport(
+            make_account(page_size=3, entries_per_project=6, **kwargs))
+        return teamwork.Teamwork("example.teamwork.com", "key",
+                                 transport=self.transport, max_workers=4)
+
+    def test_project_times_read_every_page(self):
+        entries = self.client().get_project_times(101)
+        self.assertEqual(len(entries), 6)
+        self.assertEqual(self.transport.paths().count(
+            "projects/101/time_entries.json"), 2)
+
+    def test_entries_across_projects_and_date_ranges(self):
+        tw = self.client()
+        entries = list(tw.iter_time_entries(
+            project_ids=[101, 102],
+            date_ranges=[(date(2020, 1, 1), date(2020, 3, 31)),
+                         (date(2020, 4, 1), None)],
+            records=True))
+        self.assertEqual([entry["id"] for entry in entries],
+                         ["1010", "1011", "1012", "1013", "1014", "1015",
+                          "1020", "1021", "1022", "1023", "1024", "1025"])
+        self.assertEqual(len(list(tw.iter_time_entries())), 36)
+
+    def test_bulk_save_reports_each_entry(self):
+        tw = self.client()
+        self.transport.routes[("POST", "projects/101/time_entries.json")] = \
+            FakeResponse(201, {"timeLogId": "1"})
+        entries = [dict(project_id=project_id, entry_date=date(2020, 1, 2),
+                        duration=timedelta(hours=1), user_id=1,
+                        description="Work", start_time=time(9, 0))
+                   for project_id in [101, 999, 101]]
+        results = tw.save_project_time_entries(iter(entries))
+        self.assertEqual([result["entry"] for result in results], entries)
+        self.assertIsNone(results[0]["error"])
+        self.assertIsInstance(results[1]["error"], RuntimeError)
+        self.assertIsNone(results[2]["error"])
+        self.assertEqual(len(self.transport.paths("POST")), 3)
+
+
+class TestUpdateTaskMany(TestCase):
+    def test_updates_merged_per_task_with_report(self):
+        transport = FakeTransport({
+            ("PUT", "tasks/1.json"): {},
+            ("PUT", "tasks/2.json"): FakeResponse(422, reason="Invalid"),
+            ("PUT", "tasks/3.json"): {},
+        })
+        tw = teamwork.Teamwork("example.teamwork.com", "key",
+                               transport=transport, max_workers=4)
+        report = tw.update_task_many([
+            (1, {"due-date": "20210315"}),
+            (2, {"due-date": "20210316"}),
+            ("1", {"due-date": "20210401", "progress": 50}),
+            (3, {"progress": 10}),
+        ])
+        self.assertEqual([item["task_id"] for item in report], ["1", "2", "3"])
+        self.assertEqual(report[0]["data"], {"due-date": "20210401", "progress": 50})
+        self.assertIsNone(report[0]["error"])
+        self.assertIn("422", str(report[1]["error"]))
+        self.assertIsNone(report[2]["error"])
+        self.assertEqual(sorted(transport.paths("PUT")),
+                         ["tasks/1.json", "tasks/2.json", "tasks/3.json"])
+
+
+class TestRequestCoalescing(TestCase):
+    def test_concurrent_identical_gets_share_one_request(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_tags(params):
+            started.set()
+            release.wait(5)
+            return {"tags": [{"id": "7", "name": "Tech"}]}
+
+        transport = FakeTransport({"tags.json": slow_tags})
+        tw = teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            first = executor.submit(tw.get, "tags.json")
+            started.wait(5)
+            others = [executor.submit(tw.get, "tags.json") for _ in range(3)]
+            # Let the followers join the request in flight
+            while tw.flights.shared < 3:
+                time_module.sleep(0.001)
+            release.set()
+            results = [first.result()] + [future.result() for future in others]
+
+        self.assertEqual(transport.paths().count("tags.json"), 1)
+        self.assertTrue(all(result == results[0] for result in results))
+        # Each caller gets its own copy
+        self.assertEqual(len(set(id(result) for result in results)), 4)
+
+        tw.get("tags.json")
+        self.assertEqual(transport.paths().count("tags.json"), 2)
+
+
+class TestLazyClient(TestCase):
+    def test_lazy_client_authenticates_on_first_use(self):
+        transport = FakeTransport(make_account())
+        tw = teamwork.Teamwork("example.teamwork.com", "key",
+                               transport=transport, lazy=True)
+        self.assertEqual(transport.calls, [])
+        tw.get_projects()
+        self.assertNotIn("authenticate.json", transport.paths())
+        self.assertEqual(tw._user.id, 1)
+        self.assertEqual(transport.paths().count("authenticate.json"), 1)
+
+    def test_auth_cache_shared_between_clients(self):
+        path = os.path.join(tempfile.mkdtemp(), "auth.json")
+        first = FakeTransport(make_account())
+        teamwork.Teamwork("example.teamwork.com", "key", transport=first,
+                          auth_cache=path)
+        second = FakeTransport(make_account())
+        tw = teamwork.Teamwork("example.teamwork.com", "key", transport=second,
+                               auth_cache=path)
+        self.assertEqual(first.paths().count("authenticate.json"), 1)
+        self.assertEqual(second.calls, [])
+        self.assertTrue(tw._account)
+
+    def test_logger_set_up_once(self):
+        transport = FakeTransport(make_account())
+        for _ in range(3):
+            teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+        handlers = [handler for handler in logging.getLogger().handlers
+                    if getattr(handler, "_teamwork", False)]
+        self.assertEqual(len(handlers), 1)
+
+    def test_heavy_modules_imported_on_use(self):
+        code = ("import sys, teamwork; "
+                "print(sorted(set(sys.modules) & {'requests', 'asyncio', 'sqlite3', 'gzip'})); "
+                "teamwork.SyncStore; print('sqlite3' in sys.modules)")
+        output = subprocess.check_output([sys.executable, "-c", code], text=True)
+        self.assertEqual(output.split("\n")[:2], ["[]", "True"])
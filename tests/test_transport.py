@@ -0,0 +1,122 @@
+from unittest import TestCase
+import teamwork
+from teamwork.transport import HttpTransport
+from tests.fakes import FakeTransport, FakeResponse
+
+
+class TestHttpTransport(TestCase):
+    def test_session_defaults(self):
+        transport = HttpTransport("key", pool_size=4)
+        self.assertEqual(transport.session.auth, ("key", ""))
+        self.assertIn("gzip", transport.session.headers["Accept-Encoding"])
+        self.assertEqual(transport.session.headers["Connection"], "keep-alive")
+        adapter = transport.session.get_adapter("https://example.teamwork.com")
+        self.assertEqual(adapter._pool_maxsize, 4)
+        transport.close()
+
+
+class TestTeamworkTransport(TestCase):
+    def test_requests_go_through_transport(self):
+        transport = FakeTransport({
+            "projects.json": {"projects": [{"id": "1"}]},
+            "tasks/5.json": FakeResponse(200, {}),
+        })
+        tw = teamwork.Teamwork("example.teamwork.com", "key", transport=transport)
+        self.assertEqual(tw.get_projects(), [{"id": "1"}])
+        tw.update_task(5, {"content": "x"})
+        self.assertEqual(transport.paths(),
+                         ["authenticate.json", "projects.json"])
+        self.assertEqual(transport.paths("PUT"), ["tasks/5.json"])
+
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = 0
+
+    def request(self, method, url, **kwargs):
+        self.sent += 1
+        return self.responses.pop(0)
+
+
+class TestRateLimiting(TestCase):
+    def transport(self, responses, **kwargs):
+        self.now = 0.0
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        limiter = teamwork.RateLimiter(sleep=sleep, clock=lambda: self.now,
+                                       wall_clock=lambda: 1600000000 + self.now,
+                                       **kwargs)
+        transport = HttpTransport("key", rate_limiter=limiter)
+        transport.session = FakeSession(responses)
+        return transport
+
+    def test_retries_429_and_5xx(self):
+        transport = self.transport([
+            FakeResponse(429, headers={"Retry-After": "2"}),
+            FakeResponse(503),
+            FakeResponse(200, {"ok": True}),
+        ])
+        resp = transport.request("GET", "https://example.teamwork.com/x.json")
+        self.assertEqual(resp.json(), {"ok": True})
+        self.assertEqual(transport.retries, 2)
+        self.assertGreaterEqual(self.sleeps[0], 2)
+
+    def test_post_not_retried_on_5xx(self):
+        transport = self.transport([FakeResponse(500), FakeResponse(201)])
+        resp = transport.request("POST", "https://example.teamwork.com/x.json")
+        self.assertEqual(resp.status_code, 500)
+
+    def test_gives_up_after_max_retries(self):
+        transport = self.transport([FakeResponse(429)] * 3, max_retries=2)
+        resp = transport.request("GET", "https://example.teamwork.com/x.json")
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(transport.session.sent, 3)
+
+    def test_slows_down_when_remaining_runs_out(self):
+        transport = self.transport([
+            FakeResponse(200, headers={"X-RateLimit-Limit": "150",
+                                       "X-RateLimit-Remaining": "0",
+                                       "X-RateLimit-Reset": "30"}),
+            FakeResponse(200),
+        ])
+        transport.request("GET", "https://example.teamwork.com/a.json")
+        self.assertEqual(self.sleeps, [])
+        transport.request("GET", "https://example.teamwork.com/b.json")
+        self.assertTrue(self.sleeps and self.sleeps[0] > 25)
+
+    def test_hyphenated_headers(self):
+        transport = self.transport([
+            FakeResponse(200, headers={"X-Rate-Limit-Limit": "100",
+                                       "X-Rate-Limit-Remaining": "0",
+                                       "X-Rate-Limit-Reset": "20"}),
+            FakeResponse(200),
+        ])
+        transport.request("GET", "https://example.teamwork.com/a.json")
+        self.assertEqual(transport.rate_limiter.rate, 100)
+        transport.request("GET", "https://example.teamwork.com/b.json")
+        self.assertTrue(self.sleeps and 15 < self.sleeps[0] <= 20)
+
+    def test_epoch_reset(self):
+        transport = self.transport([
+            FakeResponse(200, headers={"X-Rate-Limit-Remaining": "0",
+                                       "X-Rate-Limit-Reset": str(1600000000 + 30)}),
+            FakeResponse(200),
+        ])
+        transport.request("GET", "https://example.teamwork.com/a.json")
+        transport.request("GET", "https://example.teamwork.com/b.json")
+        self.assertTrue(self.sleeps and 25 < self.sleeps[0] <= 30)
+
+    def test_reset_pause_capped(self):
+        transport = self.transport([
+            FakeResponse(200, headers={"X-Rate-Limit-Remaining": "0",
+                                       "X-Rate-Limit-Reset": str(1600000000 + 86400)}),
+            FakeResponse(200),
+        ])
+        transport.request("GET", "https://example.teamwork.com/a.json")
+        transport.request("GET", "https://example.teamwork.com/b.json")
+        self.assertLessEqual(sum(self.sleeps), 60)